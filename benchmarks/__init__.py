@@ -0,0 +1,11 @@
+import sys
+sys.path.insert(0, 'src')
+
+from bitboard import BitBoard
+from engine import Board
+
+
+BOARDS = {
+    'mailbox': Board,
+    'bitboard': BitBoard,
+}
@@ -0,0 +1,46 @@
+import argparse
+import sys
+
+from benchmarks import BOARDS, base, engine_b, memory_b, state_b
+
+
+def main():
+    parser = argparse.ArgumentParser(description='dark-chess engine benchmarks')
+    parser.add_argument('suites', nargs='*', metavar='suite',
+                        help='engine (default), memory or state')
+    parser.add_argument('--backend', choices=sorted(BOARDS), default='mailbox')
+    parser.add_argument('--depth', type=int, default=3, help='perft depth from initial position')
+    parser.add_argument('--time', type=float, default=0.2, help='seconds per measurement')
+    parser.add_argument('--save', metavar='FILE', help='store results as json baseline')
+    parser.add_argument('--baseline', metavar='FILE', help='compare results with json baseline')
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help='allowed throughput drop in percents')
+    args = parser.parse_args()
+
+    board_class = BOARDS[args.backend]
+    suites = args.suites or ['engine']
+    for suite in suites:
+        if suite not in ('engine', 'memory', 'state'):
+            parser.error('unknown suite {}'.format(suite))
+    results = {}
+    if 'engine' in suites:
+        results.update(engine_b.run(board_class, args.depth, args.time))
+    if 'memory' in suites:
+        results.update(memory_b.run(board_class))
+    if 'state' in suites:
+        results.update(state_b.run(board_class, args.time))
+    for name, value in sorted(results.items()):
+        unit = 'bytes' if name.startswith(base.LOWER_IS_BETTER) else '/s'
+        print('{:<40} {:>14.1f} {}'.format(name, value, unit))
+    if args.save:
+        base.save(results, args.save)
+    if args.baseline:
+        regressions = base.compare(results, base.load(args.baseline), args.tolerance)
+        for name, old, new, change in regressions:
+            print('REGRESSION {}: {:.1f} -> {:.1f} ({:+.1f}%)'.format(name, old, new, change))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
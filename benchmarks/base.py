@@ -0,0 +1,46 @@
+import json
+import time
+
+
+# results with these prefixes are sizes, so they must not grow
+LOWER_IS_BETTER = ('memory.', 'size.')
+
+
+def measure(func, min_time=0.2, repeat=3):
+    best = 0
+    for i in range(repeat):
+        count, started = 0, time.perf_counter()
+        while True:
+            func()
+            count += 1
+            spent = time.perf_counter() - started
+            if spent >= min_time:
+                break
+        best = max(best, count / spent)
+    return best
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, value in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        change = (value - base) * 100.0 / base
+        if name.startswith(LOWER_IS_BETTER):
+            worse = change > tolerance
+        else:
+            worse = change < -tolerance
+        if worse:
+            regressions.append((name, base, value, change))
+    return regressions
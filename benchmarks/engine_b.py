@@ -0,0 +1,107 @@
+from functools import partial
+
+from benchmarks.base import measure
+from consts import WHITE, BLACK, UNKNOWN
+from engine import Board, Game, perft
+from errors import EndGame
+from serializers import BoardSerializer
+
+
+# (name, state, next color, cut)
+POSITIONS = [
+    ('initial', None, WHITE, ''),
+    (
+        'italian',
+        'Pa2,Pb2,Pd4,Pf2,Pg2,Ph2,Ra1,Rh1,Nc3,Nf3,Bc1,Bc4,Qd1,Ke1,pa7,pb7,pc7,'
+        'pd7,pf7,pg7,ph7,ra8,rh8,nc6,ne4,bc8,bb4,qd8,ke8',
+        WHITE, 'pPp'
+    ),
+    (
+        'queens_gambit',
+        'Pa2,Pb2,Pd4,Pe3,Pf2,Pg2,Ph2,Rc1,Rh1,Nc3,Nf3,Bg5,Bf1,Qd1,Ke1,pa7,pb7,'
+        'pc6,pc4,pe6,pf7,pg7,ph7,ra8,rh8,nd7,nf6,bc8,be7,qd8,ke8',
+        WHITE, 'P'
+    ),
+    (
+        'dragon',
+        'Pa2,Pb2,Pc2,Pe4,Pf3,Pg2,Ph2,Ra1,Rh1,Nc3,Nd4,Be3,Bf1,Qd2,Ke1,pa7,pb7,'
+        'pd6,pe7,pf7,pg6,ph7,ra8,rh8,nc6,nf6,bc8,bg7,qd8,ke8',
+        BLACK, 'Pp'
+    ),
+    (
+        'king_walk',
+        'Pa2,Pb2,Pc2,Pd3,Pe4,Pf2,Pg2,Ph2,Ra1,Rh1,Nc3,Bc1,Bf7,Qg3,Ke1,pa7,pb7,'
+        'pc7,pd6,pe5,pg6,ph7,ra8,rh8,nc6,nf6,be2,bg7,qd8,ke7',
+        WHITE, 'nP'
+    ),
+]
+
+
+def load_figures(board, state):
+    board.loadFigures(state)
+
+
+def update_figures(board):
+    board.updateFigures()
+    for fig in board.figures:
+        fig.getMoves()
+
+
+def game_move(game):
+    color = game.current_player
+    for fig in game.board.figures:
+        if fig.color == color and fig.getMoves():
+            break
+    try:
+        game.move(color, (fig.x, fig.y), fig.getMoves()[0])
+    except Exception:
+        pass
+    game.pop()
+
+
+def game_end(game):
+    # the move captures the king, so the game ends
+    try:
+        game.move(WHITE, (5, 2), (5, 8))
+    except EndGame:
+        pass
+    game.pop()
+
+
+def reparse(board, cut, color):
+    # string round trip, with move caches generated again to match a clone
+    copy = board.__class__(str(board), cut, color)
+    for fig in copy.figures:
+        fig.getMoves()
+
+
+def clone(board):
+    board.clone()
+
+
+def serialize(board, color):
+    BoardSerializer(board, color).calc()
+
+
+def run(board_class=Board, depth=3, min_time=0.2):
+    results = {}
+    for name, state, color, cut in POSITIONS:
+        board = board_class(state, cut)
+        if state is None:
+            state = str(board)
+        # midgame positions have about twice as many moves
+        plies = depth if name == 'initial' else depth - 1
+        nodes = perft(board, color, plies)
+        results['perft.{}'.format(name)] = nodes * measure(partial(perft, board, color, plies), min_time)
+        results['loadFigures.{}'.format(name)] = measure(partial(load_figures, board, state), min_time)
+        results['updateFigures.{}'.format(name)] = measure(partial(update_figures, board), min_time)
+        results['Board.reparse.{}'.format(name)] = measure(partial(reparse, board, cut, color), min_time)
+        results['Board.clone.{}'.format(name)] = measure(partial(clone, board), min_time)
+        game = Game(state, color, cut, board_class=board_class)
+        results['Game.move.{}'.format(name)] = measure(partial(game_move, game), min_time)
+        for view, title in ((WHITE, 'white'), (BLACK, 'black'), (UNKNOWN, 'unknown')):
+            key = 'BoardSerializer.{}.{}'.format(title, name)
+            results[key] = measure(partial(serialize, board, view), min_time)
+    game = Game('Ke1,Qe2,ke8', WHITE, board_class=board_class)
+    results['Game.move.end'] = measure(partial(game_end, game), min_time)
+    return results
@@ -0,0 +1,45 @@
+import tracemalloc
+
+from benchmarks.engine_b import POSITIONS
+from engine import Board, Game
+
+
+# knights going forth and back, four plies per round
+SHUFFLE = [((7, 1), (6, 3)), ((7, 8), (6, 6)), ((6, 3), (7, 1)), ((6, 6), (7, 8))]
+
+
+def loaded(board_class, state, color, cut):
+    game = Game(state, color, cut, board_class=board_class)
+    for fig in game.board.figures:
+        fig.getMoves()
+    return game
+
+
+def played(board_class, plies):
+    game = Game(board_class=board_class)
+    for i in range(plies):
+        game.move(game.current_player, *SHUFFLE[i % 4])
+    return game
+
+
+def allocated(func, count):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        # objects are kept alive until memory is measured
+        objects = [func() for i in range(count)]
+        size = (tracemalloc.get_traced_memory()[0] - before) / count
+        del objects
+        return size
+    finally:
+        tracemalloc.stop()
+
+
+def run(board_class=Board, count=100):
+    results = {}
+    for name, state, color, cut in POSITIONS:
+        results['memory.game.{}'.format(name)] = allocated(
+            lambda: loaded(board_class, state, color, cut), count
+        )
+    results['memory.played.200'] = allocated(lambda: played(board_class, 200), count // 10 or 1)
+    return results
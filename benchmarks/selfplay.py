@@ -0,0 +1,133 @@
+import argparse
+import multiprocessing
+import random
+import resource
+import sys
+import time
+import traceback
+from collections import Counter
+
+from benchmarks import BOARDS
+from engine import Game
+from errors import EndGame
+from consts import WHITE
+
+
+def random_mover(game, rnd):
+    moves = [
+        ((fig.x, fig.y), move)
+        for fig in game.board.figures if fig.color == game.current_player
+        for move in fig.getMoves()
+    ]
+    return rnd.choice(moves)
+
+
+def capture_mover(game, rnd):
+    # takes the most valuable figure it can, otherwise moves randomly
+    best, moves = 0, []
+    for fig in game.board.figures:
+        if fig.color != game.current_player:
+            continue
+        for x, y in fig.getMoves():
+            victim = game.board.cell2Figure(x, y)
+            kind = victim.kind if victim else 0
+            if kind > best:
+                best, moves = kind, []
+            if kind == best:
+                moves.append(((fig.x, fig.y), (x, y)))
+    return rnd.choice(moves)
+
+
+MOVERS = {
+    'random': random_mover,
+    'capture': capture_mover,
+}
+
+
+def play(index, seed, mover, board_class, max_plies, check):
+    rnd = random.Random(seed + index)
+    game = Game(board_class=board_class)
+    game.board.check_updates = check
+    for ply in range(max_plies):
+        cut = ''.join(cut_symbol(kind, color) for kind, color in game.board.cuts)
+        state = (str(game.board), cut, game.current_player)
+        try:
+            game.move(game.current_player, *mover(game, rnd))
+        except EndGame as e:
+            return type(e).__name__, ply + 1, None
+        except Exception:
+            return 'Error', ply + 1, (index, state, traceback.format_exc())
+    return 'Unfinished', max_plies, None
+
+
+def cut_symbol(kind, color):
+    symbol = '?PRNBQK'[kind]
+    return symbol if color == WHITE else symbol.lower()
+
+
+def play_chunk(args):
+    indexes, seed, mover, backend, max_plies, check = args
+    results = Counter()
+    lengths, failures = [], []
+    for index in indexes:
+        outcome, plies, failure = play(index, seed, MOVERS[mover], BOARDS[backend], max_plies, check)
+        results[outcome] += 1
+        lengths.append(plies)
+        if failure:
+            failures.append(failure)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results, lengths, failures, rss
+
+
+def report(results, lengths, spent, rss):
+    games, moves = sum(results.values()), sum(lengths)
+    print('games: {}, moves: {}, time: {:.2f}s'.format(games, moves, spent))
+    print('games/s: {:.1f}, moves/s: {:.1f}'.format(games / spent, moves / spent))
+    for outcome, count in sorted(results.items()):
+        print('{:<12} {:>8} {:>6.1f}%'.format(outcome, count, count * 100.0 / games))
+    lengths = sorted(lengths)
+    print('length min/median/max: {}/{}/{}'.format(
+        lengths[0], lengths[len(lengths) // 2], lengths[-1]
+    ))
+    print('peak rss per worker: {} KB'.format(max(rss)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='dark-chess self-play harness')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=None, help='default is cpu count')
+    parser.add_argument('--chunk', type=int, default=20, help='games per pool task')
+    parser.add_argument('--mover', choices=sorted(MOVERS), default='random')
+    parser.add_argument('--backend', choices=sorted(BOARDS), default='mailbox')
+    parser.add_argument('--max-plies', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0, help='game i uses seed + i')
+    parser.add_argument('--check', action='store_true', help='compare incremental updates with full ones')
+    parser.add_argument('--dump', metavar='FILE', help='write failed positions to file')
+    args = parser.parse_args()
+
+    tasks = [
+        (range(first, min(first + args.chunk, args.games)), args.seed, args.mover,
+         args.backend, args.max_plies, args.check)
+        for first in range(0, args.games, args.chunk)
+    ]
+    results, lengths, failures, rss = Counter(), [], [], []
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        for chunk in pool.imap_unordered(play_chunk, tasks):
+            results.update(chunk[0])
+            lengths.extend(chunk[1])
+            failures.extend(chunk[2])
+            rss.append(chunk[3])
+    report(results, lengths, time.perf_counter() - started, rss)
+    if failures and args.dump:
+        with open(args.dump, 'w') as f:
+            for index, (state, cut, color), error in sorted(failures):
+                f.write('# game {}, seed {}\n{} {} {}\n{}\n'.format(
+                    index, args.seed + index, state, cut or '-', color, error
+                ))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
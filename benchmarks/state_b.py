@@ -0,0 +1,31 @@
+from functools import partial
+
+from benchmarks.base import measure
+from benchmarks.engine_b import POSITIONS
+from engine import Board
+
+
+def dump_text(board):
+    return str(board)
+
+
+def dump_packed(board):
+    return board.pack()
+
+
+FORMATS = [
+    ('text', dump_text),
+    ('packed', dump_packed),
+]
+
+
+def run(board_class=Board, min_time=0.2):
+    results = {}
+    for name, state, color, cut in POSITIONS:
+        board = board_class(state, cut, color)
+        for title, dump in FORMATS:
+            data = dump(board)
+            results['state.dump.{}.{}'.format(title, name)] = measure(partial(dump, board), min_time)
+            results['state.load.{}.{}'.format(title, name)] = measure(partial(board_class, data, cut), min_time)
+            results['size.state.{}.{}'.format(title, name)] = len(data)
+    return results
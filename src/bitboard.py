@@ -0,0 +1,190 @@
+from engine import Board, cell2index, mask2cells, BOARD_CELLS
+from helpers import onBoard
+from consts import (
+    WHITE, BLACK, PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING,
+    BISHOP_MOVES, KNIGHT_MOVES, ROOK_MOVES, KING_MOVES
+)
+
+
+SQUARES = BOARD_CELLS
+
+
+def leaps(deltas):
+    masks = []
+    for x, y in SQUARES:
+        mask = 0
+        for dx, dy in deltas:
+            if onBoard(x + dx, y + dy):
+                mask |= 1 << cell2index(x + dx, y + dy)
+        masks.append(mask)
+    return masks
+
+
+def ray(x, y, dx, dy):
+    mask = 0
+    x, y = x + dx, y + dy
+    while onBoard(x, y):
+        mask |= 1 << cell2index(x, y)
+        x, y = x + dx, y + dy
+    return mask
+
+
+def pushes(color):
+    masks = []
+    step, start = (1, 2) if color == WHITE else (-1, 7)
+    for x, y in SQUARES:
+        mask = 0
+        if onBoard(x, y + step):
+            mask |= 1 << cell2index(x, y + step)
+            if y == start:
+                mask |= 1 << cell2index(x, y + 2 * step)
+        masks.append(mask)
+    return masks
+
+
+KNIGHT_ATTACKS = leaps(KNIGHT_MOVES)
+KING_ATTACKS = leaps(KING_MOVES)
+PAWN_ATTACKS = {
+    WHITE: leaps(((-1, 1), (1, 1))),
+    BLACK: leaps(((-1, -1), (1, -1))),
+}
+# cells a pawn can go forward to, they are watched even when blocked
+PAWN_PUSHES = {
+    WHITE: pushes(WHITE),
+    BLACK: pushes(BLACK),
+}
+# castling depends on the whole back rank
+BACK_RANKS = {
+    WHITE: 0xff,
+    BLACK: 0xff << 56,
+}
+# rays going to higher indexes stop at the lowest blocker, others at the highest
+RAYS = {
+    (dx, dy): [ray(x, y, dx, dy) for x, y in SQUARES]
+    for dx, dy in KING_MOVES
+}
+SLIDES = {
+    BISHOP: BISHOP_MOVES,
+    ROOK: ROOK_MOVES,
+    QUEEN: BISHOP_MOVES + ROOK_MOVES,
+}
+
+
+def slide(index, deltas, occupied):
+    attacks = 0
+    for delta in deltas:
+        rays = RAYS[delta]
+        mask = rays[index]
+        blockers = mask & occupied
+        if blockers:
+            if delta[1] > 0 or (delta[1] == 0 and delta[0] > 0):
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            mask ^= rays[blocker]
+        attacks |= mask
+    return attacks
+
+
+class BitBoard(Board):
+
+    def fillCells(self):
+        self._pieces = {
+            WHITE: {PAWN: 0, ROOK: 0, KNIGHT: 0, BISHOP: 0, QUEEN: 0, KING: 0},
+            BLACK: {PAWN: 0, ROOK: 0, KNIGHT: 0, BISHOP: 0, QUEEN: 0, KING: 0},
+        }
+        self._occupied = {WHITE: 0, BLACK: 0}
+        super(BitBoard, self).fillCells()
+
+    def clone(self):
+        board = super(BitBoard, self).clone()
+        board._pieces = {color: dict(kinds) for color, kinds in self._pieces.items()}
+        board._occupied = dict(self._occupied)
+        return board
+
+    def putFigure(self, figure):
+        super(BitBoard, self).putFigure(figure)
+        bit = 1 << cell2index(figure.x, figure.y)
+        self._pieces[figure.color][figure.kind] |= bit
+        self._occupied[figure.color] |= bit
+
+    def liftFigure(self, figure):
+        index = cell2index(figure.x, figure.y)
+        if self._cells[index] is figure:
+            bit = ~(1 << index)
+            self._pieces[figure.color][figure.kind] &= bit
+            self._occupied[figure.color] &= bit
+        super(BitBoard, self).liftFigure(figure)
+
+    def pieces(self, color, kind=None):
+        if kind is None:
+            return self._occupied[color]
+        return self._pieces[color][kind]
+
+    def generateMoves(self, figure):
+        # watch is a mask of cells the moves depend on, with the cell of figure
+        index = cell2index(figure.x, figure.y)
+        color = figure.color
+        own = self._occupied[color]
+        occupied = own | self._occupied[BLACK if color == WHITE else WHITE]
+        kind = figure.kind
+        if kind == PAWN:
+            attacks = PAWN_ATTACKS[color][index]
+            moves = self.pawnMoves(figure, index, occupied) | attacks & occupied & ~own
+            watch = PAWN_PUSHES[color][index] | attacks
+        elif kind == KNIGHT:
+            watch = KNIGHT_ATTACKS[index]
+            moves = watch & ~own
+        elif kind == KING:
+            watch = KING_ATTACKS[index]
+            moves = watch & ~own
+            if not figure.moved:
+                watch |= BACK_RANKS[color]
+        else:
+            watch = slide(index, SLIDES[kind], occupied)
+            moves = watch & ~own
+        moves = mask2cells(moves)
+        if kind == KING:
+            if figure.can_castle(True):
+                moves.append((figure.x + 2, figure.y))
+            if figure.can_castle(False):
+                moves.append((figure.x - 2, figure.y))
+        figure._moves = moves
+        figure._watch = watch | 1 << index
+
+    def pawnMoves(self, pawn, index, occupied):
+        if pawn.color == WHITE:
+            if pawn.y == 8:
+                return 0
+            step, start = 8, 2
+        else:
+            if pawn.y == 1:
+                return 0
+            step, start = -8, 7
+        one = 1 << (index + step)
+        if one & occupied:
+            return 0
+        if pawn.y == start:
+            two = 1 << (index + 2 * step)
+            if not two & occupied:
+                return one | two
+        return one
+
+    def updateFigures(self, cells=None):
+        # same as on mailbox, but watched cells are masks
+        if cells is None:
+            return super(BitBoard, self).updateFigures()
+        changed = 0
+        for x, y in cells:
+            changed |= 1 << cell2index(x, y)
+        caches = []
+        for fig in self._figure_list:
+            if fig._moves is None:
+                if changed >> cell2index(fig.x, fig.y) & 1:
+                    fig.reset()
+            elif fig._watch & changed:
+                caches.append((fig, fig._moves, fig._watch))
+                fig.reset()
+        if self.check_updates:
+            self.checkFigures()
+        return caches
@@ -0,0 +1,197 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+import consts
+import errors
+from consts import WHITE, BLACK, PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING
+from engine import Board, BOARD_CELLS, mask2cells
+from cache import redis
+from game import Game
+from helpers import invert_color, pos2coors, get_queue_name, computer_level
+from loggers import getLogger
+
+
+logger = getLogger(__name__)
+
+VALUES = {PAWN: 100, KNIGHT: 300, BISHOP: 300, ROOK: 500, QUEEN: 900, KING: 20000}
+WIN = 1000000
+START = {PAWN: 8, ROOK: 2, KNIGHT: 2, BISHOP: 2, QUEEN: 1, KING: 1}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def determinize(board, color, rnd=random):
+    # known figures stay, unseen enemy figures are placed on unseen cells
+    visible = set(mask2cells(board.visibility(color)))
+    enemy = invert_color(color)
+    hidden = dict(START)
+    for kind, fig_color in board.cuts:
+        if fig_color == enemy:
+            hidden[kind] -= 1
+    figures, moved = [], []
+    for fig in board.figures:
+        if (fig.x, fig.y) in visible:
+            figures.append(str(fig))
+            moved.append(fig.moved)
+            if fig.color == enemy:
+                hidden[fig.kind] -= 1
+    free = [(x, y) for x in range(1, 9) for y in range(1, 9) if (x, y) not in visible]
+    rnd.shuffle(free)
+    symbols = 'prnbqk' if enemy == BLACK else 'PRNBQK'
+    for kind, symbol in zip((PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING), symbols):
+        for i in range(hidden[kind]):
+            cells = [cell for cell in free if kind != PAWN or 1 < cell[1] < 8]
+            if not cells:
+                break
+            free.remove(cells[0])
+            figures.append('{}{}'.format(symbol, pos2coors(*cells[0])))
+    sample = Board(','.join(figures), color=color)
+    for fig, flag in zip(sample.figures, moved):
+        fig._moved = flag
+    sample.fillCells()
+    return sample
+
+
+def evaluate(board, color):
+    score = 0
+    for fig in board.figures:
+        value = VALUES[fig.kind]
+        if fig.kind == PAWN:
+            value += 5 * (fig.y - 2 if fig.color == WHITE else 7 - fig.y)
+        score += value if fig.color == color else -value
+    return score
+
+
+def ordered_moves(board, color):
+    moves = []
+    cells = board._cells
+    for code in board.legalMoves(color):
+        victim = cells[code & 63]
+        x, y = BOARD_CELLS[code & 63]
+        moves.append((VALUES[victim.kind] if victim else 0, cells[code >> 6], x, y))
+    moves.sort(key=lambda move: -move[0])
+    return [move[1:] for move in moves]
+
+
+def negamax(board, color, depth, alpha, beta, deadline):
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout
+    if depth == 0:
+        return evaluate(board, color)
+    best = -WIN * 2
+    for fig, x, y in ordered_moves(board, color):
+        end_game = board.push(fig, x, y)
+        try:
+            if end_game is None:
+                score = -negamax(board, invert_color(color), depth - 1, -beta, -alpha, deadline)
+            elif end_game in (errors.WhiteWon, errors.BlackWon):
+                # faster wins have more depth left
+                score = WIN + depth if (end_game == errors.WhiteWon) == (color == WHITE) else -WIN - depth
+            else:
+                score = 0
+        finally:
+            board.pop()
+        if score > best:
+            best = score
+        if score > alpha:
+            alpha = score
+        if alpha >= beta:
+            break
+    return best
+
+
+def search(board, color, budget, max_depth):
+    deadline = time.perf_counter() + budget
+    moves = ordered_moves(board, color)
+    best = None
+    for depth in range(1, max_depth + 1):
+        try:
+            scores = []
+            alpha = -WIN * 2
+            for fig, x, y in moves:
+                move = (fig.x, fig.y, x, y)
+                end_game = board.push(fig, x, y)
+                try:
+                    if end_game is None:
+                        # the first depth always completes to have a move
+                        score = -negamax(
+                            board, invert_color(color), depth - 1, -WIN * 2, -alpha,
+                            deadline if depth > 1 else None
+                        )
+                    elif end_game in (errors.WhiteWon, errors.BlackWon):
+                        score = WIN + depth
+                    else:
+                        score = 0
+                finally:
+                    board.pop()
+                scores.append((score, move))
+                alpha = max(alpha, score)
+        except SearchTimeout:
+            break
+        best = max(scores, key=lambda item: item[0])
+        if best[0] >= WIN:
+            break
+        # search the best moves first on the next depth
+        ranked = sorted(zip(scores, moves), key=lambda item: -item[0][0])
+        moves = [move for score, move in ranked]
+    return best
+
+
+def think(state, color, budget, max_depth):
+    board = Board(state, color=color)
+    return search(board, color, budget, max_depth)
+
+
+def choose_move(board, color, level, pool=None, rnd=random):
+    budget, samples, max_depth = config.BOT_LEVELS[level]
+    states = [determinize(board, color, rnd).pack() for i in range(samples)]
+    args = (states, [color] * samples, [budget] * samples, [max_depth] * samples)
+    if pool is None:
+        results = list(map(think, *args))
+    else:
+        results = list(pool.map(think, *args))
+    votes, scores = Counter(), Counter()
+    for result in results:
+        if result is not None:
+            score, move = result
+            votes[move] += 1
+            scores[move] += score
+    if not votes:
+        return None
+    x1, y1, x2, y2 = max(votes, key=lambda move: (votes[move], scores[move]))
+    return (x1, y1), (x2, y2)
+
+
+def play(token, pool=None):
+    game = Game.load_game(token)
+    color = game.get_color()
+    if game.model.ended or game.model.next_color != color:
+        return False
+    move = choose_move(game.game.board, color, computer_level(token), pool)
+    if move is None:
+        return False
+    game.move(pos2coors(*move[0]), pos2coors(*move[1]))
+    return True
+
+
+def run(pool=None, timeout=5):
+    queue = get_queue_name(consts.COMPUTER_QUEUE)
+    while True:
+        item = redis.blpop(queue, timeout)
+        if item is None:
+            continue
+        token = item[1].decode()
+        try:
+            play(token, pool)
+        except Exception as e:
+            logger.error('computer move in {} failed: {}'.format(token, e))
+
+
+if __name__ == '__main__':
+    with ProcessPoolExecutor(config.BOT_PROCESSES) as pool:
+        run(pool)
@@ -31,6 +31,33 @@ def delete_cache(key):
     redis.delete(key)
 
 
+def get_stamp(key):
+    value = redis.get(key)
+    return value.decode() if value else None
+
+
+def add_stamp(key, value):
+    # false if there is a stamp already
+    return redis.setnx(key, value.encode())
+
+
+def swap_stamp(key, value):
+    old = redis.getset(key, value.encode())
+    return old.decode() if old else None
+
+
+def schedule(key, member, at):
+    redis.zadd(key, at, member)
+
+
+def unschedule(key, member):
+    return redis.zrem(key, member)
+
+
+def get_scheduled(key, until, count):
+    return [value.decode() for value in redis.zrangebyscore(key, '-inf', until, start=0, num=count)]
+
+
 def add_to_queue(token, prefix=''):
     redis.rpush(get_queue_name(prefix), token.encode())
 
@@ -45,6 +45,24 @@ TOKEN_SHORT_LENGTH = 10
 
 # game config
 GAME_QUEUE_NAME = 'players_queue'
+ENGINE_BACKEND = 'mailbox'  # mailbox or bitboard
+ENGINE_CHECK_UPDATES = False  # compare incremental move updates with full ones
+ENGINE_PACKED_STATE = False  # store Game.state packed, run migrate.py state first
+ENGINE_STATS = False  # count and time engine calls, see engine.PROCESS_STATS
+ENGINE_CACHE_SIZE = 1000  # parsed boards kept by each process, 0 to disable
+REPLAY_CHECKPOINT_PLIES = 20  # store a packed position every n moves, 0 to disable
+GAME_SESSION_CACHE_SIZE = 1000  # loaded games kept by each process, 0 to disable
+CLOCK_BATCH = 100  # timed games expired by scheduler at once
+CLOCK_INTERVAL = 1  # seconds the scheduler sleeps when nothing is due
+CLOCK_RETRY = 10  # seconds before the scheduler tries a failed game again
+# computer levels: (seconds per sample, sampled positions, max depth)
+BOT_LEVELS = {
+    1: (0.1, 1, 2),
+    2: (0.5, 4, 4),
+    3: (2.0, 8, 6),
+}
+BOT_DEFAULT_LEVEL = 1
+BOT_PROCESSES = None  # pool size of bot worker, None for cpu count
 
 # chat config
 MAX_COUNT_MESSAGES = 50
@@ -33,6 +33,20 @@ ROOK_MOVES = (1, 0), (-1, 0), (0, 1), (0, -1)
 QUEEN_MOVES = BISHOP_MOVES + ROOK_MOVES
 KING_MOVES = QUEEN_MOVES
 
+# castling rights
+CASTLE_WHITE_SHORT = 0x1
+CASTLE_WHITE_LONG  = 0x2
+CASTLE_BLACK_SHORT = 0x4
+CASTLE_BLACK_LONG  = 0x8
+CASTLES_ALL = 0xf
+
+# computer player, tokens are COMPUTER_PREFIX + level + '-' + random part
+COMPUTER_PREFIX = 'computer'
+COMPUTER_QUEUE = 'computer'
+
+# deadlines of timed games, sorted set of white tokens scored by unix time
+CLOCK_QUEUE = 'clock'
+
 # ws signals
 WS_NONE  = 0x0000
 WS_START = 0x0001
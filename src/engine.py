@@ -1,27 +1,135 @@
+import base64
+import random
+import time
+from array import array
+from collections import namedtuple, Counter
+
 from helpers import onBoard, invert_color, pos2coors, coors2pos
 from errors import (
     OutOfBoardError, CellIsBusyError, EndGame, WhiteWon, BlackWon, Draw,
-    WrongMoveError, NotFoundError, WrongTurnError, WrongFigureError
+    WrongMoveError, NotFoundError, WrongTurnError, WrongFigureError,
+    UpdateFiguresError
 )
 from consts import *
 
 
+# captured and promoted are (figure, index in figures, index in kind) tuples,
+# rook is (rook, x, moved), caches are (figure, moves, watch) tuples
+NO_CELLS = frozenset()
+Undo = namedtuple('Undo', 'figure x y moved captured rook promoted cut caches hash color')
+
+# fixed seed keeps hashes equal between processes
+_random = random.Random(0xdc)
+ZOBRIST_FIGURES = {
+    color: {kind: [_random.getrandbits(64) for i in range(64)] for kind in FIGURES}
+    for color in COLORS
+}
+ZOBRIST_CUTS = {
+    color: {kind: [_random.getrandbits(64) for i in range(16)] for kind in FIGURES}
+    for color in COLORS
+}
+ZOBRIST_CASTLES = [_random.getrandbits(64) for i in range(CASTLES_ALL + 1)]
+ZOBRIST_BLACK = _random.getrandbits(64)
+# packed state is the marker, then base64 of a flags byte (castles, side to move)
+# and 32 bytes with a nibble per cell: kind, plus 8 for black figures
+PACKED_STATE = '~'
+PACKED_BLACK = 0x10
+CASTLES = (
+    (WHITE, 1, 8, CASTLE_WHITE_SHORT),
+    (WHITE, 1, 1, CASTLE_WHITE_LONG),
+    (BLACK, 8, 8, CASTLE_BLACK_SHORT),
+    (BLACK, 8, 1, CASTLE_BLACK_LONG),
+)
+
+
+def cell2index(x, y):
+    return (y - 1) * 8 + x - 1
+
+
+def lineCells(x, y, dx, dy):
+    cells = []
+    x, y = x + dx, y + dy
+    while onBoard(x, y):
+        cells.append(((x, y), cell2index(x, y)))
+        x, y = x + dx, y + dy
+    return tuple(cells)
+
+
+def leapCells(x, y, deltas):
+    return tuple(
+        ((x + dx, y + dy), cell2index(x + dx, y + dy))
+        for dx, dy in deltas if onBoard(x + dx, y + dy)
+    )
+
+
+# per cell index tuples of ((x, y), index) in the order moves are generated
+BOARD_CELLS = [(x, y) for y in range(1, 9) for x in range(1, 9)]
+LINE_CELLS = {
+    (dx, dy): [lineCells(x, y, dx, dy) for x, y in BOARD_CELLS]
+    for dx, dy in BISHOP_MOVES + ROOK_MOVES
+}
+LINE_DELTAS = {BISHOP: BISHOP_MOVES, ROOK: ROOK_MOVES, QUEEN: QUEEN_MOVES}
+KNIGHT_CELLS = [leapCells(x, y, KNIGHT_MOVES) for x, y in BOARD_CELLS]
+KING_CELLS = [leapCells(x, y, KING_MOVES) for x, y in BOARD_CELLS]
+
+
+def mask2cells(mask):
+    cells = []
+    while mask:
+        bit = mask & -mask
+        cells.append(BOARD_CELLS[bit.bit_length() - 1])
+        mask ^= bit
+    return cells
+
+
+def moveCells(code):
+    return BOARD_CELLS[code >> 6 & 63], BOARD_CELLS[code & 63]
+
+
+def moveCoors(code):
+    return '{}-{}'.format(*(pos2coors(*cell) for cell in moveCells(code)))
+
+
+def encodeMove(figure, x1, y1, x2, y2):
+    code = figure.kind | (8 if figure.color == BLACK else 0)
+    return code << 12 | cell2index(x1, y1) << 6 | cell2index(x2, y2)
+
+
+def decodeMove(code):
+    symbol = '?PRNBQK'[code >> 12 & 7]
+    return {
+        'symbol': symbol.lower() if code & 0x8000 else symbol,
+        'x1': (code >> 6 & 63) % 8 + 1,
+        'y1': (code >> 6 & 63) // 8 + 1,
+        'x2': (code & 63) % 8 + 1,
+        'y2': (code & 63) // 8 + 1,
+    }
+
+
 class Board(object):
     _figures = {}
     _figure_list = []
-    _moves = []
+    _cells = [None] * 64
     _cut = None
-
-    def __init__(self, figures=None, cut=[]):
+    _hash = 0
+    check_updates = False
+    history_limit = None
+    stats = None
+
+    def __init__(self, figures=None, cut=[], color=WHITE):
+        self._visible = {}
+        self._moves = array('H')
+        self._undo = []
+        self._color = color
+        self._cut_list = []
+        if cut:
+            for fig in cut:
+                cls, fig_color = FIGURES_MAP[fig]
+                self._cut_list.append((cls.kind, fig_color))
         if figures is not None:
             self.loadFigures(figures)
         else:
             self.standFigures()
-        self._cut_list = []
-        if cut:
-            for fig in cut:
-                cls, color = FIGURES_MAP[fig]
-                self._cut_list.append((cls.kind, color))
 
     def standFigures(self):
         self._figures = {
@@ -50,8 +158,11 @@ class Board(object):
                         self._figure_list.append(fig)
                 else:
                     self._figure_list.append(figs)
+        self.fillCells()
 
     def loadFigures(self, line):
+        if line.startswith(PACKED_STATE):
+            return self.loadPacked(line)
         figures = {
             WHITE: {PAWN: [], ROOK: [], KNIGHT: [], BISHOP: [], QUEEN: [], KING: None},
             BLACK: {PAWN: [], ROOK: [], KNIGHT: [], BISHOP: [], QUEEN: [], KING: None}
@@ -68,13 +179,86 @@ class Board(object):
             figure_list.append(figure)
         self._figures = figures
         self._figure_list = figure_list
+        self.fillCells()
+
+    def loadPacked(self, line):
+        data = base64.b64decode(line[len(PACKED_STATE):])
+        figures = {
+            WHITE: {PAWN: [], ROOK: [], KNIGHT: [], BISHOP: [], QUEEN: [], KING: None},
+            BLACK: {PAWN: [], ROOK: [], KNIGHT: [], BISHOP: [], QUEEN: [], KING: None}
+        }
+        figure_list = []
+        cells = {}
+        for i, byte in enumerate(data[1:33]):
+            if not byte:
+                continue
+            for index, code in ((i * 2, byte & 15), (i * 2 + 1, byte >> 4)):
+                if not code:
+                    continue
+                cls = PACKED_FIGURES[code & 7]
+                color = BLACK if code & 8 else WHITE
+                figure = cls(index % 8 + 1, index // 8 + 1, color, self)
+                if cls == King:
+                    figures[color][KING] = figure
+                else:
+                    figures[color][cls.kind].append(figure)
+                figure_list.append(figure)
+                cells[index] = figure
+        castles = data[0]
+        for color, y, x, castle in CASTLES:
+            if not castles & castle:
+                rook = cells.get(cell2index(x, y))
+                if rook is not None:
+                    rook._moved = True
+        for color, castle in ((WHITE, CASTLE_WHITE_SHORT | CASTLE_WHITE_LONG),
+                              (BLACK, CASTLE_BLACK_SHORT | CASTLE_BLACK_LONG)):
+            if not castles & castle and figures[color][KING]:
+                figures[color][KING]._moved = True
+        self._color = BLACK if castles & PACKED_BLACK else WHITE
+        self._figures = figures
+        self._figure_list = figure_list
+        self.fillCells()
+
+    def pack(self):
+        data = bytearray(33)
+        data[0] = self.castles | (PACKED_BLACK if self._color == BLACK else 0)
+        for fig in self._figure_list:
+            index = cell2index(fig.x, fig.y)
+            code = fig.kind | 8 if fig.color == BLACK else fig.kind
+            data[1 + index // 2] |= code << (index & 1) * 4
+        return PACKED_STATE + base64.b64encode(bytes(data)).decode()
+
+    def fillCells(self):
+        self._cells = [None] * 64
+        self._hash = 0
+        for fig in self._figure_list:
+            self.putFigure(fig)
+        self._hash ^= ZOBRIST_CASTLES[self.castles]
+        if self._color == BLACK:
+            self._hash ^= ZOBRIST_BLACK
+        counts = {}
+        for kind, color in self._cut_list:
+            count = counts.get((kind, color), 0)
+            self._hash ^= ZOBRIST_CUTS[color][kind][count]
+            counts[kind, color] = count + 1
+
+    def putFigure(self, figure):
+        index = cell2index(figure.x, figure.y)
+        self._cells[index] = figure
+        self._visible.clear()
+        self._hash ^= ZOBRIST_FIGURES[figure.color][figure.kind][index]
+
+    def liftFigure(self, figure):
+        index = cell2index(figure.x, figure.y)
+        if self._cells[index] is figure:
+            self._cells[index] = None
+            self._hash ^= ZOBRIST_FIGURES[figure.color][figure.kind][index]
+            self._visible.clear()
 
     def cell2Figure(self, x, y):
         if not onBoard(x, y):
             raise OutOfBoardError
-        for fig in self.figures:
-            if fig.x == x and fig.y == y:
-                return fig
+        return self._cells[cell2index(x, y)]
 
     def isProtected(self, x, y, color):
         # deprecated because king can be cut
@@ -92,48 +276,287 @@ class Board(object):
         return False
 
     def move(self, figure, x, y):
-        self._cut = None
-        end_game = None
+        end_game = self.makeMove(figure, x, y)
+        if end_game:
+            raise end_game
+
+    def push(self, figure, x, y):
+        if isinstance(figure, King) and abs(x - figure.x) == 2 and y == figure.y:
+            rook = figure.can_castle(x > figure.x)
+            if rook:
+                return self.makeCastle(figure, rook)
+        return self.makeMove(figure, x, y)
+
+    def pop(self):
+        undo = self._undo.pop()
+        figure = undo.figure
+        cells = [(figure.x, figure.y), (undo.x, undo.y)]
+        if undo.promoted:
+            queen, index, kind_index = undo.promoted
+            self.liftFigure(queen)
+            self._figure_list.remove(queen)
+            self._figures[queen.color][QUEEN].remove(queen)
+            self._figure_list.insert(index, figure)
+            self._figures[figure.color][figure.kind].insert(kind_index, figure)
+        else:
+            self.liftFigure(figure)
+        figure.x, figure.y = undo.x, undo.y
+        figure._moved = undo.moved
+        self.putFigure(figure)
+        if undo.rook:
+            rook, x, moved = undo.rook
+            cells += [(rook.x, rook.y), (x, rook.y)]
+            self.liftFigure(rook)
+            rook.x = x
+            rook._moved = moved
+            self.putFigure(rook)
+        elif self._moves:
+            self._moves.pop()
+        if undo.captured:
+            fig, index, kind_index = undo.captured
+            self._figure_list.insert(index, fig)
+            if kind_index is not None:
+                self._figures[fig.color][fig.kind].insert(kind_index, fig)
+            self.putFigure(fig)
+            self._cut_list.pop()
+        self._cut = undo.cut
+        self._hash, self._color = undo.hash, undo.color
+        self.updateFigures(cells)
+        for fig, moves, watch in undo.caches:
+            fig._moves, fig._watch = moves, watch
+        return figure
+
+    def makeMove(self, figure, x, y):
         fig = self.cell2Figure(x, y)
+        if fig and fig.color == figure.color:
+            raise CellIsBusyError
+        end_game, captured, promoted = None, None, None
+        cut, self._cut = self._cut, None
+        hash, color, castles = self._hash, self._color, self.castles
         if fig:
-            if fig.color == figure.color:
-                raise CellIsBusyError
-            else:
-                if isinstance(fig, King):
-                    if fig.color == WHITE:
-                        end_game = BlackWon
-                    else:
-                        end_game = WhiteWon
-                self._figure_list.remove(fig)
-                self._cut = fig
-                self._cut_list.append((fig.kind, fig.color))
-                fig.terminate()
-        self._moves.append({
-            'figure': figure,
-            'x1': figure.x,
-            'y1': figure.y,
-            'x2': x,
-            'y2': y,
-        })
+            if isinstance(fig, King):
+                if fig.color == WHITE:
+                    end_game = BlackWon
+                else:
+                    end_game = WhiteWon
+            captured = fig, self._figure_list.index(fig), self.kindIndex(fig)
+            del self._figure_list[captured[1]]
+            self._cut = fig
+            count = self._cut_list.count((fig.kind, fig.color))
+            self._hash ^= ZOBRIST_CUTS[fig.color][fig.kind][count]
+            self._cut_list.append((fig.kind, fig.color))
+            fig.terminate()
+        self._moves.append(encodeMove(figure, figure.x, figure.y, x, y))
+        x1, y1, moved = figure.x, figure.y, figure._moved
+        self.liftFigure(figure)
         figure.x, figure.y = x, y
-        self.updateFigures()
-        if end_game:
-            raise end_game
-        for fig in self.figures:
-            if fig.color == figure.color:
+        figure._moved = True
+        self.putFigure(figure)
+        if isinstance(figure, Pawn) and y == (8 if figure.color == WHITE else 1):
+            index = self._figure_list.index(figure)
+            kind_index = self.kindIndex(figure)
+            promoted = self.transform(figure), index, kind_index
+        self.updateHash(figure.color, castles)
+        caches = self.updateFigures(((x1, y1), (x, y)))
+        self.addUndo(Undo(
+            figure, x1, y1, moved, captured, None, promoted, cut, caches, hash, color
+        ))
+        return end_game or self.checkDraw(figure.color)
+
+    def makeCastle(self, king, rook):
+        hash, color, castles = self._hash, self._color, self.castles
+        x1, y1, moved = king.x, king.y, king._moved
+        undo_rook = rook, rook.x, rook._moved
+        cells = [(king.x, king.y), (rook.x, rook.y)]
+        self.liftFigure(king)
+        self.liftFigure(rook)
+        if rook.x == 8:
+            king.x, rook.x = 7, 6
+        else:
+            king.x, rook.x = 3, 4
+        king._moved = rook._moved = True
+        self.putFigure(king)
+        self.putFigure(rook)
+        cells += [(king.x, king.y), (rook.x, rook.y)]
+        self.updateHash(king.color, castles)
+        caches = self.updateFigures(cells)
+        self.addUndo(Undo(
+            king, x1, y1, moved, None, undo_rook, None, self._cut, caches, hash, color
+        ))
+        return self.checkDraw(king.color)
+
+    def addUndo(self, undo):
+        self._undo.append(undo)
+        limit = self.history_limit
+        # trim by halves to keep appending amortized O(1)
+        if limit and len(self._undo) > 2 * limit:
+            del self._undo[:-limit]
+            del self._moves[:-limit]
+
+    def updateHash(self, color, castles):
+        self._hash ^= ZOBRIST_CASTLES[castles] ^ ZOBRIST_CASTLES[self.castles]
+        if self._color == color:
+            self._color = invert_color(color)
+            self._hash ^= ZOBRIST_BLACK
+
+    @property
+    def hash(self):
+        return self._hash
+
+    @property
+    def color(self):
+        return self._color
+
+    @property
+    def castles(self):
+        castles = 0
+        for color, y, x, castle in CASTLES:
+            king = self._cells[cell2index(5, y)]
+            rook = self._cells[cell2index(x, y)]
+            if isinstance(king, King) and king.color == color and not king.moved and \
+                    isinstance(rook, Rook) and rook.color == color and not rook.moved:
+                castles |= castle
+        return castles
+
+    def checkDraw(self, color):
+        if self.hasMoves(invert_color(color)):
+            return None
+        return Draw
+
+    def clone(self):
+        # copy keeps history, but cannot pop moves made before it;
+        # move lists are shared, they are replaced and never changed in place
+        board = object.__new__(self.__class__)
+        board.__dict__.update(self.__dict__)
+        board._visible = {}
+        board._moves = array('H', self._moves)
+        board._undo = []
+        board._cut_list = list(self._cut_list)
+        figures = {
+            WHITE: {PAWN: [], ROOK: [], KNIGHT: [], BISHOP: [], QUEEN: [], KING: None},
+            BLACK: {PAWN: [], ROOK: [], KNIGHT: [], BISHOP: [], QUEEN: [], KING: None}
+        }
+        cells = [None] * 64
+        figure_list = []
+        # kind lists keep the order of the figure list
+        for fig in self._figure_list:
+            figure = object.__new__(fig.__class__)
+            figure.x = x = fig.x
+            figure.y = y = fig.y
+            figure.color = color = fig.color
+            figure.board = board
+            figure._moves = fig._moves
+            figure._moved = fig._moved
+            figure._watch = fig._watch
+            if fig.kind == KING:
+                figure._aura = fig._aura
+                figures[color][KING] = figure
+            else:
+                figures[color][fig.kind].append(figure)
+            cells[(y - 1) * 8 + x - 1] = figure
+            figure_list.append(figure)
+        board._figures = figures
+        board._cells = cells
+        board._figure_list = figure_list
+        return board
+
+    def legalMoves(self, color):
+        # from << 6 | to codes of all moves of color, see moveCells;
+        # codes come from cell tables, figure move lists are not built
+        moves = array('H')
+        append = moves.append
+        cells = self._cells
+        for fig in self._figure_list:
+            if fig.color != color:
                 continue
-            if len(fig.getMoves()):
-                return
-        raise Draw
+            index = (fig.y - 1) * 8 + fig.x - 1
+            origin = index << 6
+            kind = fig.kind
+            if kind == PAWN:
+                step = 8 if color == WHITE else -8
+                last, start = (8, 2) if color == WHITE else (1, 7)
+                if fig.y != last:
+                    i = index + step
+                    if cells[i] is None:
+                        append(origin | i)
+                        if fig.y == start and cells[i + step] is None:
+                            append(origin | i + step)
+                    for dx in (-1, 1):
+                        if 1 <= fig.x + dx <= 8:
+                            target = cells[i + dx]
+                            if target is not None and target.color != color:
+                                append(origin | i + dx)
+            elif kind == KNIGHT or kind == KING:
+                for cell, i in (KNIGHT_CELLS if kind == KNIGHT else KING_CELLS)[index]:
+                    target = cells[i]
+                    if target is None or target.color != color:
+                        append(origin | i)
+                if kind == KING:
+                    if fig.can_castle(True):
+                        append(origin | index + 2)
+                    if fig.can_castle(False):
+                        append(origin | index - 2)
+            else:
+                for delta in LINE_DELTAS[kind]:
+                    for cell, i in LINE_CELLS[delta][index]:
+                        target = cells[i]
+                        if target is None:
+                            append(origin | i)
+                            continue
+                        if target.color != color:
+                            append(origin | i)
+                        break
+        return moves
+
+    def hasMoves(self, color):
+        figures = self._figures[color]
+        king = figures[KING]
+        if king is not None and king.hasMoves():
+            return True
+        for kind in (KNIGHT, PAWN, BISHOP, ROOK, QUEEN):
+            for fig in figures[kind]:
+                if fig.hasMoves():
+                    return True
+        return False
+
+    def kindIndex(self, figure):
+        figs = self._figures[figure.color][figure.kind]
+        if isinstance(figs, list):
+            return figs.index(figure)
 
     def __str__(self):
         return ','.join(map(str, self.figures))
 
-    def updateFigures(self):
+    def generateMoves(self, figure):
+        # fills moves and watched cells of figure, backends may build them differently
+        figure.updateMoves()
+
+    def updateFigures(self, cells=None):
+        caches = []
         for fig in self.figures:
-            fig.reset()
+            if cells is None or fig.watches(cells):
+                if fig._moves is not None:
+                    caches.append((fig, fig._moves, fig._watch))
+                fig.reset()
+        if self.check_updates:
+            self.checkFigures()
+        return caches
+
+    def enableStats(self):
+        # plain boards have no instrumentation, so it is switched by class
+        if self.stats is None:
+            self.__class__ = instrumented(self.__class__)
+            self.stats = EngineStats(PROCESS_STATS)
+        return self.stats
+
+    def checkFigures(self):
         for fig in self.figures:
-            fig.update()
+            moves = fig._moves
+            if moves is None:
+                continue
+            self.generateMoves(fig)
+            if sorted(moves) != sorted(fig._moves):
+                raise UpdateFiguresError(fig)
 
     @property
     def figures(self):
@@ -151,28 +574,52 @@ class Board(object):
             raise NotFoundError
 
     def castle(self, king, rook):
-        if rook.x == 8:
-            king.x, rook.x = 7, 6
-        else:
-            king.x, rook.x = 3, 4
-        self.updateFigures()
+        end_game = self.makeCastle(king, rook)
+        if end_game:
+            raise end_game
 
     @property
     def moves(self):
-        return self._moves
+        moves = self._moves
+        if self.history_limit:
+            moves = moves[-self.history_limit:]
+        return [decodeMove(code) for code in moves]
 
     def denyCastle(self, color, short=None):
+        castles = self.castles
         if short is None:
-            self.getFigure(color, KING)._moved = True
-            return
-        y = 1 if color == WHITE else 8
-        rook_x = 8 if short else 1
-        try:
-            rook = self.cell2Figure(x=rook_x, y=y)
-        except (NotFoundError, OutOfBoardError):
-            return
-        if rook:
-            rook._moved = True
+            king = self.getFigure(color, KING)
+            king._moved = True
+            king.reset()
+        else:
+            y = 1 if color == WHITE else 8
+            rook = self.cell2Figure(x=8 if short else 1, y=y)
+            if rook:
+                rook._moved = True
+                king = self._figures[color][KING]
+                if king:
+                    king.reset()
+        self._hash ^= ZOBRIST_CASTLES[castles] ^ ZOBRIST_CASTLES[self.castles]
+        self._visible.clear()
+
+    def setCastles(self, castles):
+        # rights can only be denied, moved figures do not get them back
+        for color, y, x, castle in CASTLES:
+            if self.castles & castle and not castles & castle:
+                self.denyCastle(color, x == 8)
+
+    def visibility(self, color):
+        # mask of cells seen by color, bit index is cell2index
+        mask = self._visible.get(color)
+        if mask is None:
+            mask = 0
+            for fig in self._figure_list:
+                if fig.color == color:
+                    mask |= 1 << cell2index(fig.x, fig.y)
+                    for x, y in fig.getVisibleCells():
+                        mask |= 1 << cell2index(x, y)
+            self._visible[color] = mask
+        return mask
 
     def transform(self, pawn):
         queen = Queen(pawn.x, pawn.y, pawn.color, self)
@@ -180,6 +627,8 @@ class Board(object):
         self._figure_list.append(queen)
         self._figure_list.remove(pawn)
         pawn.terminate()
+        self.putFigure(queen)
+        return queen
 
     @property
     def lastCut(self):
@@ -191,19 +640,19 @@ class Board(object):
 
 
 class Figure(object):
+    __slots__ = ('x', 'y', 'color', 'board', '_moves', '_moved', '_watch')
 
-    color = UNKNOWN
     kind = UNKNOWN
-    x, y = 0, 0
     _symbol = '?'
-    _moves = None
-    _moved = False
 
     def __init__(self, x, y, color, board):
         self.x = x
         self.y = y
         self.color = color
         self.board = board
+        self._moves = None
+        self._moved = False
+        self._watch = NO_CELLS
 
     @property
     def symbol(self):
@@ -216,7 +665,9 @@ class Figure(object):
 
     def getMoves(self):
         if self._moves is None:
-            self.updateMoves()
+            self.update()
+            if self.board.stats is not None:
+                self.board.stats.update(self.kind)
         return self._moves
 
     def updateMoves(self):
@@ -226,7 +677,6 @@ class Figure(object):
         if (x, y) not in self.getMoves():
             raise WrongMoveError
         self.board.move(self, x, y)
-        self._moved = True
 
     def isEnemy(self, figure):
         return figure.color != self.color
@@ -234,31 +684,72 @@ class Figure(object):
     def isFriend(self, figure):
         return figure.color == self.color
 
-    def getLineMoves(self, deltaList):
+    def getLineMoves(self, deltaList, watch=None):
         moves = []
-        for dx, dy in deltaList:
-            if dx == 0 and dy == 0:
+        cells = self.board._cells
+        index = cell2index(self.x, self.y)
+        for delta in deltaList:
+            if delta not in LINE_CELLS:
                 continue
-            x, y = self.x, self.y
-            while True:
-                x += dx
-                y += dy
-                try:
-                    fig = self.board.cell2Figure(x, y)
-                except OutOfBoardError:
-                    break
+            for cell, i in LINE_CELLS[delta][index]:
+                if watch is not None:
+                    watch.add(cell)
+                fig = cells[i]
                 if fig:
-                    if self.isEnemy(fig):
-                        moves.append((x, y))
+                    if fig.color != self.color:
+                        moves.append(cell)
                     break
-                moves.append((x, y))
+                moves.append(cell)
+        return moves
+
+    def hasMoves(self):
+        if self._moves is not None:
+            return len(self._moves) > 0
+        return self.canMove()
+
+    def canMove(self):
+        return len(self.getMoves()) > 0
+
+    def canLineMove(self, deltaList):
+        cells = self.board._cells
+        index = cell2index(self.x, self.y)
+        for delta in deltaList:
+            for cell, i in LINE_CELLS[delta][index][:1]:
+                fig = cells[i]
+                if not fig or fig.color != self.color:
+                    return True
+        return False
+
+    def canLeapMove(self, table):
+        cells = self.board._cells
+        for cell, i in table[cell2index(self.x, self.y)]:
+            fig = cells[i]
+            if not fig or fig.color != self.color:
+                return True
+        return False
+
+    def getLeapMoves(self, table, watch):
+        moves = []
+        cells = self.board._cells
+        for cell, i in table[cell2index(self.x, self.y)]:
+            watch.add(cell)
+            fig = cells[i]
+            if not fig or fig.color != self.color:
+                moves.append(cell)
         return moves
 
     def update(self):
-        self.updateMoves()
+        # boards may generate moves their own way
+        if self.board is None:
+            self.updateMoves()
+        else:
+            self.board.generateMoves(self)
 
     def reset(self):
-        _moves = None
+        self._moves = None
+
+    def watches(self, cells):
+        return (self.x, self.y) in cells or not self._watch.isdisjoint(cells)
 
     @property
     def moved(self):
@@ -266,12 +757,15 @@ class Figure(object):
 
     def terminate(self):
         self.board._figures[self.color][self.kind].remove(self)
+        self.board.liftFigure(self)
 
     def getVisibleCells(self):
         return self.getMoves()
 
 
 class Pawn(Figure):
+    __slots__ = ()
+
     _symbol = 'P'
     kind = PAWN
 
@@ -289,22 +783,24 @@ class Pawn(Figure):
             elif self.y > 1:
                 moves.append((self.x, self.y - 1))
             cutMoves = (self.x - 1, self.y - 1), (self.x + 1, self.y - 1)
+        cells = self.board._cells
+        watch = set()
+        # forward moves never leave the board, side ones are checked
         for x, y in moves:
-            try:
-                fig = self.board.cell2Figure(x, y)
-            except OutOfBoardError:
-                break
+            fig = cells[cell2index(x, y)]
+            watch.add((x, y))
             if fig:
                 break
             result.append((x, y))
         for x, y in cutMoves:
-            try:
-                fig = self.board.cell2Figure(x, y)
-            except OutOfBoardError:
+            if not onBoard(x, y):
                 continue
+            fig = cells[cell2index(x, y)]
+            watch.add((x, y))
             if fig and self.isEnemy(fig):
                 result.append((x, y))
         self._moves = result
+        self._watch = watch
 
     def getVisibleCells(self):
         cells = []
@@ -326,74 +822,94 @@ class Pawn(Figure):
             cells += [(self.x - 1, self.y - 1), (self.x + 1, self.y - 1)]
         return [cell for cell in cells if onBoard(*cell)]
 
-    def move(self, x, y):
-        super(Pawn, self).move(x, y)
-        if (self.color == WHITE and y == 8) or (self.color == BLACK and y == 1):
-            self.board.transform(self)
-
 
 class Bishop(Figure):
+    __slots__ = ()
+
     _symbol = 'B'
     kind = BISHOP
 
     def updateMoves(self):
-        self._moves = self.getLineMoves(BISHOP_MOVES)
+        watch = set()
+        self._moves = self.getLineMoves(BISHOP_MOVES, watch)
+        self._watch = watch
+
+    def canMove(self):
+        return self.canLineMove(BISHOP_MOVES)
 
 
 class Knight(Figure):
+    __slots__ = ()
+
     _symbol = 'N'
     kind = KNIGHT
 
     def updateMoves(self):
-        moves = []
-        for dx, dy in (KNIGHT_MOVES):
-            x = self.x + dx
-            y = self.y + dy
-            try:
-                fig = self.board.cell2Figure(x, y)
-            except OutOfBoardError:
-                continue
-            if not fig or self.isEnemy(fig):
-                moves.append((x, y))
-        self._moves = moves
+        watch = set()
+        self._moves = self.getLeapMoves(KNIGHT_CELLS, watch)
+        self._watch = watch
+
+    def canMove(self):
+        return self.canLeapMove(KNIGHT_CELLS)
 
 
 class Rook(Figure):
+    __slots__ = ()
+
     _symbol = 'R'
     kind = ROOK
 
     def updateMoves(self):
-        self._moves = self.getLineMoves(ROOK_MOVES)
+        watch = set()
+        self._moves = self.getLineMoves(ROOK_MOVES, watch)
+        self._watch = watch
+
+    def canMove(self):
+        return self.canLineMove(ROOK_MOVES)
 
 
 class Queen(Figure):
+    __slots__ = ()
+
     _symbol = 'Q'
     kind = QUEEN
 
     def updateMoves(self):
-        self._moves = self.getLineMoves(QUEEN_MOVES)
+        watch = set()
+        self._moves = self.getLineMoves(QUEEN_MOVES, watch)
+        self._watch = watch
+
+    def canMove(self):
+        return self.canLineMove(QUEEN_MOVES)
 
 
 class King(Figure):
+    __slots__ = ('_aura',)
+
     _symbol = 'K'
     kind = KING
 
+    def __init__(self, x, y, color, board):
+        super(King, self).__init__(x, y, color, board)
+        self._aura = None
+
     def updateMoves(self):
-        moves = []
-        for dx, dy in KING_MOVES:
-            x = self.x + dx
-            y = self.y + dy
-            try:
-                fig = self.board.cell2Figure(x, y)
-            except OutOfBoardError:
-                continue
-            if not fig or self.isEnemy(fig):
-                moves.append((x, y))
+        watch = set()
+        moves = self.getLeapMoves(KING_CELLS, watch)
+        if not self.moved:
+            # castling depends on the whole back rank between king and rooks
+            y = 1 if self.color == WHITE else 8
+            watch.update((x, y) for x in range(1, 9))
         if self.can_castle(True):
             moves.append((self.x + 2, self.y))
         if self.can_castle(False):
             moves.append((self.x - 2, self.y))
         self._moves = moves
+        self._watch = watch
+
+    def canMove(self):
+        # castling needs a free cell next to the king, so it is never the only move
+        return self.canLeapMove(KING_CELLS)
 
     def updateAura(self):
         # deprecated because king can be cut
@@ -422,23 +938,20 @@ class King(Figure):
             y = 1
         else:
             y = 8
+        if (self.x, self.y) != (5, y):
+            return False
         if short:
             rook_x = 8
             cells = ((6, y), (7, y))
         else:
             rook_x = 1
             cells = ((2, y), (3, y), (4, y))
-        try:
-            rook = self.board.cell2Figure(x=rook_x, y=y)
-        except (NotFoundError, OutOfBoardError):
+        board_cells = self.board._cells
+        rook = board_cells[cell2index(rook_x, y)]
+        if not isinstance(rook, Rook) or rook.color != self.color or rook.moved:
             return False
-        if not rook or rook.moved:
-            return False
-        for cell in cells:
-            try:
-                if self.board.cell2Figure(*cell):
-                    return False
-            except OutOfBoardError:
+        for x, y in cells:
+            if board_cells[cell2index(x, y)]:
                 return False
         return rook
 
@@ -448,12 +961,19 @@ class King(Figure):
             raise WrongMoveError
         self.board.castle(self, rook)
 
+    def castleRook(self, x, y):
+        # rook to castle with when king moves to x, y, otherwise False
+        if (self.color == WHITE and (x, y) in ((7, 1), (3, 1))) or \
+           (self.color == BLACK and (x, y) in ((7, 8), (3, 8))):
+            return self.can_castle(x == 7)
+        return False
+
     def try_to_castle(self, x, y):
         if (self.color == WHITE and (x, y) in ((7, 1), (3, 1))) or \
            (self.color == BLACK and (x, y) in ((7, 8), (3, 8))):
+            move = '0-0' if x == 7 else '0-0-0'
             try:
                 self.castle(x == 7)
-                move = '0-0' if x == 7 else '0-0-0'
             except WrongMoveError:
                 pass
             except EndGame as exc:
@@ -472,8 +992,8 @@ class King(Figure):
 
 class Game(object):
 
-    def __init__(self, figures=None, current_player=WHITE, cut=[]):
-        self.board = Board(figures, cut)
+    def __init__(self, figures=None, current_player=WHITE, cut=[], board_class=Board):
+        self.board = board_class(figures, cut, current_player)
         self.current_player = current_player
 
     def move(self, color, pos1, pos2):
@@ -484,28 +1004,169 @@ class Game(object):
             raise NotFoundError
         if figure.color != color:
             raise WrongFigureError
-        try:
-            castled = isinstance(figure, King) and figure.try_to_castle(*pos2)
-        except EndGame as exc:
-            exc.figure = figure
-            raise exc
-        if not castled:
-            result = figure, '{}-{}'.format(pos2coors(*pos1), pos2coors(*pos2))
-            try:
-                figure.move(*pos2)
-            except EndGame as exc:
-                exc.figure, exc.move = result
-                raise exc
+        # board methods return the end of game, it is raised only here
+        rook = isinstance(figure, King) and figure.castleRook(*pos2)
+        if rook:
+            move = '0-0' if pos2[0] == 7 else '0-0-0'
+            end_game = self.board.makeCastle(figure, rook)
+        elif tuple(pos2) in figure.getMoves():
+            move = '{}-{}'.format(pos2coors(*pos1), pos2coors(*pos2))
+            end_game = self.board.makeMove(figure, *pos2)
         else:
-            result = figure, castled
+            raise WrongMoveError
+        if end_game:
+            if self.board.stats is not None:
+                self.board.stats.count('exceptions')
+            exc = end_game()
+            exc.figure, exc.move = figure, move
+            raise exc
         self.current_player = invert_color(self.current_player)
-        return result
+        return figure, move
+
+    def pop(self):
+        figure = self.board.pop()
+        self.current_player = figure.color
+        return figure
+
+    def clone(self):
+        game = self.__class__.__new__(self.__class__)
+        game.board = self.board.clone()
+        game.current_player = self.current_player
+        return game
 
     @property
     def moves(self):
         return self.board.moves
 
 
+def perft(board, color, depth):
+    if depth == 0:
+        return 1
+    moves = board.legalMoves(color)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    cells = board._cells
+    for code in moves:
+        x, y = BOARD_CELLS[code & 63]
+        if board.push(cells[code >> 6], x, y):
+            nodes += 1
+        else:
+            nodes += perft(board, invert_color(color), depth - 1)
+        board.pop()
+    return nodes
+
+
+class EngineStats(object):
+    # counts are cell2Figure, moves, exceptions and regenerated (move lists
+    # dropped or rebuilt, undo included), updates are move generations by kind,
+    # times are seconds spent in move, updateFigures and checkDraw
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.counts = Counter()
+        self.updates = Counter()
+        self.times = Counter()
+
+    def count(self, name, value=1):
+        self.counts[name] += value
+        if self.parent is not None:
+            self.parent.counts[name] += value
+
+    def update(self, kind):
+        self.updates[kind] += 1
+        if self.parent is not None:
+            self.parent.updates[kind] += 1
+
+    def spend(self, name, seconds):
+        self.times[name] += seconds
+        if self.parent is not None:
+            self.parent.times[name] += seconds
+
+    def clear(self):
+        self.counts.clear()
+        self.updates.clear()
+        self.times.clear()
+
+    def report(self):
+        moves = self.counts['moves']
+        return {
+            'counts': dict(self.counts),
+            'updates': {PACKED_FIGURES[kind].__name__: count for kind, count in self.updates.items()},
+            'times': dict(self.times),
+            'regenerated_per_move': self.counts['regenerated'] / moves if moves else 0,
+        }
+
+
+# totals of all instrumented boards of the process
+PROCESS_STATS = EngineStats()
+# instrumented subclass by board class
+INSTRUMENTED = {}
+
+
+def timed(name, method):
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        except Exception:
+            self.stats.count('exceptions')
+            raise
+        finally:
+            self.stats.spend(name, time.perf_counter() - started)
+    return wrapper
+
+
+def instrumented(board_class):
+    cls = INSTRUMENTED.get(board_class)
+    if cls is not None:
+        return cls
+
+    def cell2Figure(self, x, y):
+        self.stats.count('cell2Figure')
+        try:
+            return board_class.cell2Figure(self, x, y)
+        except Exception:
+            self.stats.count('exceptions')
+            raise
+
+    def updateFigures(self, cells=None):
+        before = [(fig, fig._moves) for fig in self.figures]
+        started = time.perf_counter()
+        caches = board_class.updateFigures(self, cells)
+        self.stats.spend('updateFigures', time.perf_counter() - started)
+        self.stats.count('regenerated', sum(1 for fig, moves in before if fig._moves is not moves))
+        return caches
+
+    def makeMove(self, figure, x, y):
+        self.stats.count('moves')
+        return move(self, figure, x, y)
+
+    def makeCastle(self, king, rook):
+        self.stats.count('moves')
+        return castle(self, king, rook)
+
+    def clone(self):
+        board = board_class.clone(self)
+        board.stats = EngineStats(PROCESS_STATS)
+        return board
+
+    move = timed('move', board_class.makeMove)
+    castle = timed('move', board_class.makeCastle)
+    methods = {
+        'cell2Figure': cell2Figure,
+        'updateFigures': updateFigures,
+        'makeMove': makeMove,
+        'makeCastle': makeCastle,
+        'checkDraw': timed('checkDraw', board_class.checkDraw),
+        'clone': clone,
+    }
+    cls = type('Instrumented' + board_class.__name__, (board_class,), methods)
+    INSTRUMENTED[board_class] = cls
+    return cls
+
+PACKED_FIGURES = [None, Pawn, Rook, Knight, Bishop, Queen, King]
+
 FIGURES_MAP = {
     'p': (Pawn, BLACK),
     'r': (Rook, BLACK),
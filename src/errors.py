@@ -35,6 +35,10 @@ class NotFoundError(BaseException):
     message = 'figure not found'
 
 
+class UpdateFiguresError(BaseArgException):
+    message = 'cached moves of {} differ from full update'
+
+
 class EndGame(BaseException):
     message = 'game is over'
     reason = consts.UNKNOWN
@@ -1,18 +1,116 @@
+import config
 import engine
 import models
 import consts
 import errors
+from bitboard import BitBoard
 from serializers import BoardSerializer, MoveSerializer
-from helpers import coors2pos, invert_color
-from cache import set_cache, get_cache, delete_cache, get_cache_func_name
+from helpers import coors2pos, invert_color, is_computer, get_queue_name, generate_token
+from cache import (
+    set_cache, get_cache, delete_cache, get_cache_func_name, add_to_queue,
+    get_stamp, add_stamp, swap_stamp, schedule, unschedule
+)
 from connections import send_ws
 from decorators import formatted
 from format import format
 from loggers import getLogger
+from lru import LRUCache
 
 
 logger = getLogger(__name__)
 
+BOARDS = {
+    'mailbox': engine.Board,
+    'bitboard': BitBoard,
+}
+
+# parsed engines by stored state, checked out as clones
+ENGINE_CACHE = LRUCache(config.ENGINE_CACHE_SIZE)
+# loaded games by token with the version they were loaded at, any process
+# stamps a new unique version when game changes, so versions never come back
+SESSION_CACHE = LRUCache(config.GAME_SESSION_CACHE_SIZE)
+
+
+def create_engine(*args, **kwargs):
+    kwargs.setdefault('board_class', BOARDS[config.ENGINE_BACKEND])
+    game = engine.Game(*args, **kwargs)
+    game.board.check_updates = config.ENGINE_CHECK_UPDATES
+    if config.ENGINE_STATS:
+        game.board.enableStats()
+    return game
+
+
+def load_engine(state, next_color, cut):
+    key = (state, next_color, cut, config.ENGINE_BACKEND)
+    game = ENGINE_CACHE.get(key)
+    if game is None:
+        game = create_engine(state, next_color, cut)
+        ENGINE_CACHE.set(key, game)
+    return game.clone()
+
+
+def session_key(token):
+    return 'game_version_{}'.format(token)
+
+
+def dump_state(board):
+    if config.ENGINE_PACKED_STATE:
+        return board.pack()
+    return str(board)
+
+
+class GameSnapshot(object):
+    # parts of info payloads for the current state, computed once for all
+    # responses and broadcasts of one request
+
+    def __init__(self, game):
+        self.game = game
+        self._boards = {}
+        self._clocks = {}
+        self._opponents = {}
+
+    def board(self, color):
+        if color not in self._boards:
+            if color == consts.UNKNOWN:
+                self._boards[color] = BoardSerializer(self.game.game.board, color).calc()
+            else:
+                self._boards[color] = self.game.get_board(color)
+        return self._boards[color]
+
+    def time_left(self, color):
+        if color not in self._clocks:
+            self._clocks[color] = self.game.time_left(color)
+        return self._clocks[color]
+
+    def opponent(self, color):
+        if color not in self._opponents:
+            model = self.game.model
+            opponent = model.player_black if color == consts.WHITE else model.player_white
+            self._opponents[color] = opponent.username if opponent else 'anonymous'
+        return self._opponents[color]
+
+    def info(self, color):
+        model = self.game.model
+        if model.ended:
+            return {
+                'board': self.board(consts.UNKNOWN),
+                'started_at': model.date_created,
+                'ended_at': model.date_end,
+                'color': consts.COLORS[color],
+                'opponent': self.opponent(color),
+                'winner': model.get_winner(),
+            }
+        return {
+            'board': self.board(color),
+            'time_left': self.time_left(color),
+            'enemy_time_left': self.time_left(invert_color(color)),
+            'started_at': model.date_created,
+            'ended_at': model.date_end,
+            'next_turn': consts.COLORS[self.game.game.current_player],
+            'color': consts.COLORS[color],
+            'opponent': self.opponent(color),
+        }
+
 
 class Game(object):
 
@@ -20,17 +118,23 @@ class Game(object):
         self.white = white_token
         self.black = black_token
         self._loaded_by = None
+        self._version = None
+        self._snapshot = None
 
     @classmethod
     def new_game(cls, white_token, black_token, type_game, time_limit, white_user=None, black_user=None):
         game = cls(white_token, black_token)
-        game.game = engine.Game()
+        game.game = create_engine()
         game.model = models.Game.create(
             white = white_token,
             black = black_token,
             player_white=white_user,
             player_black=black_user,
-            state=str(game.game.board),
+            state=dump_state(game.game.board),
+            castles=game.game.board.castles,
+            time_white=0,
+            time_black=0,
+            move_count=0,
             type_game=type_game,
             time_limit=time_limit,
         )
@@ -38,10 +142,21 @@ class Game(object):
         delete_cache('wait_{}'.format(black_token))
         game.send_ws(game.get_info(consts.WHITE), consts.WS_START, consts.WHITE)
         game.send_ws(game.get_info(consts.BLACK), consts.WS_START, consts.BLACK)
+        game.schedule_clock()
+        game.ask_computer(consts.WHITE)
         return game
 
     @classmethod
     def load_game(cls, token):
+        # version is read first, so a move made while loading only causes a miss
+        key = session_key(token)
+        version = get_stamp(key)
+        game = SESSION_CACHE.get(token, valid=lambda cached: version and cached._version == version)
+        if game is not None:
+            # clocks went on since the last request
+            game._snapshot = None
+            game.check_time()
+            return game
         try:
             try:
                 game_model = models.Game.get_game(token)
@@ -52,22 +167,67 @@ class Game(object):
                 raise errors.GameNotFoundError
             game = cls(game_model.white, game_model.black)
             game.model = game_model
-            game.game = engine.Game(game.model.state, game.model.next_color, game.model.cut)
+            game.game = load_engine(game.model.state, game.model.next_color, game.model.cut)
             game._loaded_by = game_model._loaded_by
-            if game.model.is_time_over():
-                winner = game.model.winner
-                loser = invert_color(winner)
-                game.send_ws(game.get_info(loser), consts.WS_LOSE, loser)
-                game.send_ws(game.get_info(winner), consts.WS_WIN, winner)
+            game.check_time()
             if not game.model.ended:
                 game.check_draw()
-                game.check_castles()
+                if game.model.castles is None:
+                    # next move stores rights of both colors
+                    game.check_castles(consts.WHITE)
+                    game.check_castles(consts.BLACK)
+                else:
+                    game.game.board.setCastles(game.model.castles)
         except errors.GameNotStartedError:
             raise
         except:
             raise errors.GameNotFoundError
+        if version is None:
+            # no version yet or it was lost, a change made while loading sets it first
+            stamp = generate_token()
+            if add_stamp(key, stamp):
+                version = stamp
+        if version is not None:
+            game._version = version
+            SESSION_CACHE.set(token, game)
         return game
 
+    def check_time(self, now=None):
+        if not self.model.is_time_over(now):
+            return False
+        self._snapshot = None
+        winner = self.model.winner
+        loser = invert_color(winner)
+        self.send_ws(self.get_info(loser), consts.WS_LOSE, loser)
+        self.send_ws(self.get_info(winner), consts.WS_WIN, winner)
+        self.update_session()
+        self.schedule_clock()
+        return True
+
+    def schedule_clock(self):
+        # scheduler ends the game at deadline if nobody loads it
+        key = get_queue_name(consts.CLOCK_QUEUE)
+        deadline = self.model.deadline()
+        if deadline is None:
+            unschedule(key, self.white)
+        else:
+            schedule(key, self.white, deadline.timestamp())
+
+    def update_session(self):
+        # other processes reload the game, this one keeps it if nobody else changed it
+        version = generate_token()
+        versions = {token: swap_stamp(session_key(token), version) for token in (self.white, self.black)}
+        if self._version is None:
+            return
+        self.drop_session()
+        if versions[self.get_token(self._loaded_by)] == self._version:
+            self._version = version
+            SESSION_CACHE.set(self.get_token(self._loaded_by), self)
+
+    def drop_session(self):
+        if self._version is not None:
+            SESSION_CACHE.delete(self.get_token(self._loaded_by))
+
     def get_color(self, color=None):
         if color is None:
             color = self._loaded_by
@@ -78,32 +238,17 @@ class Game(object):
     def get_board(self, color=None):
         return BoardSerializer(self.game.board, self.get_color(color)).calc()
 
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = GameSnapshot(self)
+        return self._snapshot
+
     @formatted
     def get_info(self, color=None):
-        color = self.get_color(color)
-        if color == consts.WHITE:
-            opponent = self.model.player_black
-        else:
-            opponent = self.model.player_white
-        if self.model.ended:
-            return {
-                'board': BoardSerializer(self.game.board, consts.UNKNOWN).calc(),
-                'started_at': self.model.date_created,
-                'ended_at': self.model.date_end,
-                'color': consts.COLORS[color],
-                'opponent': opponent.username if opponent else 'anonymous',
-                'winner': self.model.get_winner(),
-            }
-        return {
-            'board': self.get_board(color),
-            'time_left': self.time_left(color),
-            'enemy_time_left': self.time_left(invert_color(color)),
-            'started_at': self.model.date_created,
-            'ended_at': self.model.date_end,
-            'next_turn': consts.COLORS[self.game.current_player],
-            'color': consts.COLORS[color],
-            'opponent': opponent.username if opponent else 'anonymous',
-        }
+        return self.snapshot().info(self.get_color(color))
+
+    def has_moves(self, color=None):
+        return self.game.board.hasMoves(self.get_color(color))
 
     def time_left(self, color=None):
         return self.model.time_left(self.get_color(color))
@@ -117,16 +262,20 @@ class Game(object):
             figure, move = self.game.move(color, coors2pos(coor1), coors2pos(coor2))
         except errors.EndGame as e:
             game_over, figure, move = e.reason, e.figure, e.move
+        self._snapshot = None
         try:
+            cut = self.game.board._cut
+            # packed state keeps castle rights, so replay does not need moves before checkpoints
             num = self.model.add_move(
-                figure.symbol, move, str(self.game.board), game_over
+                figure.symbol, move, dump_state(self.game.board), game_over,
+                self.game.board.castles, cut.symbol if cut else '',
+                config.REPLAY_CHECKPOINT_PLIES, self.game.board.pack
             ).number
         except Exception as e:
             logger.error(e)
+            self.game.pop()
+            self.drop_session()
             raise errors.BaseException
-        if self.game.board._cut:
-            self.model.cut += self.game.board._cut.symbol
-            self.model.save()
         self.onMove()
         msg = self.get_info(invert_color(color))
         msg.update({'number': num})
@@ -134,8 +283,17 @@ class Game(object):
             self.send_ws(msg, consts.WS_LOSE, invert_color(color))
             return self.get_info()
         self.send_ws(msg, consts.WS_MOVE, invert_color(color))
+        self.ask_computer(invert_color(color))
         return self.get_info()
 
+    def get_token(self, color):
+        return self.white if color == consts.WHITE else self.black
+
+    def ask_computer(self, color):
+        token = self.get_token(color)
+        if is_computer(token):
+            add_to_queue(token, consts.COMPUTER_QUEUE)
+
     def send_ws(self, msg, signal, color=consts.UNKNOWN):
         tags = []
         if color != consts.WHITE:
@@ -169,6 +327,7 @@ class Game(object):
             name2 = self._get_draw_name(consts.BLACK)
             if get_cache(name1) and get_cache(name2):
                 self.model.game_over(consts.END_DRAW)
+                self._snapshot = None
                 delete_cache(name1)
                 delete_cache(name2)
                 msg = self.get_info()
@@ -183,6 +342,7 @@ class Game(object):
             raise errors.EndGame
         winner = invert_color(self.get_color(color))
         self.model.game_over(consts.END_RESIGN, winner=winner)
+        self._snapshot = None
         self.send_ws(self.get_info(winner), consts.WS_WIN, winner)
         self.onMove()
         return self.get_info()
@@ -200,6 +360,8 @@ class Game(object):
         for name in ('game_info_handler', 'game_moves_handler'):
             delete_cache(get_cache_func_name(name, token=self.white))
             delete_cache(get_cache_func_name(name, token=self.black))
+        self.update_session()
+        self.schedule_clock()
 
     def check_castles(self, color=None, log=False):
         color = self.get_color(color)
@@ -12,10 +12,10 @@ from decorators import validate
 import errors
 from game import Game
 from handlers.v2.base import RestBase
-from helpers import generate_token, get_prefix
+from helpers import generate_token, get_prefix, computer_token
 from models import User, GamePool
 from loggers import logger
-from validators import GameNewValidator, GameMoveValidator
+from validators import GameNewValidator, GameComputerValidator, GameMoveValidator
 
 
 class RestGameBase(RestBase):
@@ -162,6 +162,21 @@ class RestAcceptInvite(RestBase):
         return result
 
 
+class RestComputerGame(RestBase):
+    @validate(GameComputerValidator)
+    def post(self):
+        if self.data['type'] != consts.TYPE_NOLIMIT and not self.data['limit']:
+            raise errors.APIException('game limit must be set for no limit game')
+        token = generate_token(True)
+        game = Game.new_game(
+            token, computer_token(self.data['level']), self.data['type'], self.data['limit'],
+            white_user=request.user
+        )
+        result = {'game': token}
+        result.update(game.get_info(consts.WHITE))
+        return result
+
+
 class RestGames(RestBase):
     def get(self):
         from models import Game
@@ -31,6 +31,7 @@ bp_game.urls([
     ('/new/<game_id>/', 'accept', game.RestAcceptGame),
     ('/invite/', 'invite', game.RestNewInvite),
     ('/invite/<token>/', 'invited', game.RestAcceptInvite),
+    ('/computer/', 'computer', game.RestComputerGame),
     ('/games/', 'games', game.RestGames),
     ('/<token>/info/', 'info', game.RestInfo),
     ('/<token>/draw/', 'draw', game.RestDraw),
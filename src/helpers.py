@@ -1,7 +1,7 @@
 import uuid
 from hashlib import md5
 
-from consts import WHITE, BLACK
+from consts import WHITE, BLACK, COMPUTER_PREFIX
 import config
 
 
@@ -62,3 +62,17 @@ def get_prefix(game_type, game_limit=None):
 
 def get_request_arg(request, name):
     return request.form.get(name) or (request.json or {}).get(name)
+
+
+def computer_token(level=None):
+    if level is None:
+        level = config.BOT_DEFAULT_LEVEL
+    return '{}{}-{}'.format(COMPUTER_PREFIX, level, generate_token(True))
+
+
+def is_computer(token):
+    return token.startswith(COMPUTER_PREFIX)
+
+
+def computer_level(token):
+    return int(token[len(COMPUTER_PREFIX):].split('-', 1)[0])
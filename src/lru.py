@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None, valid=None):
+        # valid(value) is false for outdated values, they are dropped as misses
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if valid is not None and not valid(value):
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.size <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def stats(self):
+        return {
+            'size': self.size,
+            'count': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / (self.hits + self.misses) if self.hits or self.misses else 0,
+        }
@@ -0,0 +1,140 @@
+import argparse
+
+from peewee import fn
+from playhouse.migrate import SchemaMigrator, migrate
+
+import config
+import consts
+import engine
+import models
+from game import Game, create_engine
+
+
+def add_column(model, name):
+    # new columns are nullable, old rows are filled by their migration
+    database, table = model._meta.database, model.__name__.lower()
+    if name in [column.name for column in database.get_columns(table)]:
+        return False
+    migrator = SchemaMigrator.from_database(database)
+    migrate(migrator.add_column(table, name, model._meta.fields[name]))
+    return True
+
+
+def add_unique_index(model, columns):
+    database, table = model._meta.database, model.__name__.lower()
+    for index in database.get_indexes(table):
+        if index.unique and list(index.columns) == list(columns):
+            return False
+    migrator = SchemaMigrator.from_database(database)
+    migrate(migrator.add_index(table, columns, True))
+    return True
+
+
+def load_game(model):
+    game = Game(model.white, model.black)
+    game.model = model
+    game.game = create_engine(model.state, model.next_color, model.cut)
+    # text state has no castle rights, take them from moves
+    game.check_castles(consts.WHITE)
+    game.check_castles(consts.BLACK)
+    return game
+
+
+def migrate_state(packed=True):
+    count = 0
+    with config.DB.atomic():
+        for model in models.Game.select().where(models.Game.state.is_null(False)):
+            if model.state.startswith(engine.PACKED_STATE) == packed:
+                continue
+            game = load_game(model)
+            if packed:
+                state = game.game.board.pack()
+            else:
+                state = str(game.game.board)
+            models.Game.update(state=state).where(models.Game.pk == model.pk).execute()
+            count += 1
+    return count
+
+
+def migrate_castles():
+    add_column(models.Game, 'castles')
+    count = 0
+    with config.DB.atomic():
+        query = models.Game.select().where(
+            models.Game.castles.is_null(), models.Game.state.is_null(False)
+        )
+        for model in query:
+            castles = load_game(model).game.board.castles
+            models.Game.update(castles=castles).where(models.Game.pk == model.pk).execute()
+            count += 1
+    return count
+
+
+def migrate_clock():
+    add_column(models.Game, 'time_white')
+    add_column(models.Game, 'time_black')
+    migrated = set()
+    with config.DB.atomic():
+        spent = {}
+        query = models.Move.select(
+            models.Move.game, models.Move.color, fn.SUM(models.Move.time_move).alias('spent')
+        ).group_by(models.Move.game, models.Move.color)
+        for row in query.tuples():
+            spent[row[:2]] = row[2]
+        # moves store the time of their color, only empty columns are filled
+        columns = ((consts.WHITE, models.Game.time_white), (consts.BLACK, models.Game.time_black))
+        for color, field in columns:
+            for model in models.Game.select(models.Game.pk).where(field.is_null()):
+                models.Game.update(**{field.name: spent.get((model.pk, color), 0)}).where(
+                    models.Game.pk == model.pk, field.is_null()
+                ).execute()
+                migrated.add(model.pk)
+    return len(migrated)
+
+
+def migrate_moves():
+    add_column(models.Game, 'move_count')
+    # fails on duplicated move numbers, they have to be fixed by hand
+    add_unique_index(models.Move, ('game_id', 'number'))
+    query = models.Move.select(
+        models.Move.game, fn.COUNT(models.Move.pk)
+    ).group_by(models.Move.game)
+    counts = dict(query.tuples())
+    count = 0
+    with config.DB.atomic():
+        for model in models.Game.select(models.Game.pk).where(models.Game.move_count.is_null()):
+            models.Game.update(
+                move_count=counts.get(model.pk, 0)
+            ).where(models.Game.pk == model.pk).execute()
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='dark-chess data migrations')
+    commands = parser.add_subparsers(dest='command')
+    state = commands.add_parser('state', help='convert stored game states')
+    state.add_argument('--to', choices=['packed', 'text'], default='packed')
+    commands.add_parser('castles', help='add castles column and fill it from moves')
+    commands.add_parser('clock', help='add time used columns and fill them from moves')
+    commands.add_parser('moves', help='add move counter and unique move numbers')
+    args = parser.parse_args()
+
+    if args.command == 'state':
+        count = migrate_state(args.to == 'packed')
+        print('{} games migrated'.format(count))
+    elif args.command == 'castles':
+        count = migrate_castles()
+        print('{} games migrated'.format(count))
+    elif args.command == 'clock':
+        count = migrate_clock()
+        print('{} games migrated'.format(count))
+    elif args.command == 'moves':
+        count = migrate_moves()
+        print('{} games migrated'.format(count))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
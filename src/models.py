@@ -105,6 +105,13 @@ class Game(BaseModel):
     end_reason = peewee.IntegerField(null=True)
     winner = peewee.IntegerField(null=True)
     cut = peewee.CharField(default='')
+    # castle rights after the last move, null for games stored before them
+    castles = peewee.IntegerField(null=True)
+    # seconds used by each color, null for games stored before them
+    time_white = peewee.FloatField(null=True)
+    time_black = peewee.FloatField(null=True)
+    # number of moves, null for games stored before it
+    move_count = peewee.IntegerField(null=True)
 
     @classmethod
     def get_game(cls, token):
@@ -115,21 +122,38 @@ class Game(BaseModel):
             game._loaded_by = consts.BLACK
         return game
 
-    def add_move(self, figure, move, state, end_reason=None):
+    def add_move(self, figure, move, state, end_reason=None, castles=None, cut='',
+                 checkpoint_plies=0, pack=None):
+        # pack() gives the packed state, it is stored every checkpoint_plies moves
         with config.DB.atomic():
             color = self.next_color
-            num = self.moves.select().count() + 1
+            if self.move_count is None:
+                self.move_count = self.moves.select().count()
+            num = self.move_count + 1
             time_move = (datetime.now() - self.date_state).total_seconds()
             self.state = state
+            self.move_count = num
             self.next_color = invert_color(color)
             self.date_state = datetime.now()
+            spent = self.time_spent(color) + time_move
+            if color == consts.WHITE:
+                self.time_white = spent
+            else:
+                self.time_black = spent
+            if castles is not None:
+                self.castles = castles
+            self.cut += cut
             if end_reason:
                 self.game_over(end_reason, save=False, winner=color)
-            self.save()
-            return Move.create(
+            # unique move number rejects a writer with a stale game first
+            move = Move.create(
                 game=self, number=num, figure=figure, move=move,
                 time_move=time_move, color=color
             )
+            self.save()
+            if checkpoint_plies and num % checkpoint_plies == 0:
+                self.add_checkpoint(num, pack())
+            return move
 
     def game_over(self, reason, date_end=None, save=True, winner=None):
         self.date_end = date_end or datetime.now()
@@ -142,31 +166,33 @@ class Game(BaseModel):
     def ended(self):
         return bool(self.date_end)
 
-    def is_time_over(self):
-        if self.ended:
-            return False
+    def deadline(self):
+        # when the player to move runs out of time, None for games without it
+        if self.ended or self.time_limit is None:
+            return None
         if self.type_game == consts.TYPE_SLOW:
-            if (datetime.now() - self.date_state).total_seconds() > self.time_limit:
-                self.game_over(
-                    consts.END_TIME,
-                    self.date_state + timedelta(seconds=self.time_limit),
-                    winner=invert_color(self.next_color)
-                )
-                return True
-        elif self.type_game == consts.TYPE_FAST:
-            moves = self.moves.select(Move.time_move).where(Move.color == self.next_color)
-            time_spent = sum([m.time_move for m in moves])
-            if time_spent + (datetime.now() - self.date_state).total_seconds() > self.time_limit:
-                self.game_over(
-                    consts.END_TIME,
-                    self.date_state + timedelta(seconds=self.time_limit - time_spent),
-                    winner=invert_color(self.next_color)
-                )
-                return True
-        return False
+            return self.date_state + timedelta(seconds=self.time_limit)
+        if self.type_game == consts.TYPE_FAST:
+            time_spent = self.time_spent(self.next_color)
+            return self.date_state + timedelta(seconds=self.time_limit - time_spent)
+        return None
+
+    def is_time_over(self, now=None):
+        deadline = self.deadline()
+        if deadline is None or (now or datetime.now()) <= deadline:
+            return False
+        self.game_over(consts.END_TIME, deadline, winner=invert_color(self.next_color))
+        return True
+
+    def time_spent(self, color):
+        spent = self.time_white if color == consts.WHITE else self.time_black
+        if spent is None:
+            moves = self.moves.select(Move.time_move).where(Move.color == color)
+            spent = sum([m.time_move for m in moves])
+        return spent
 
     def time_left(self, color):
-        if self.ended:
+        if self.ended or self.time_limit is None:
             return None
         if self.type_game == consts.TYPE_SLOW:
             time_left = self.time_limit
@@ -174,8 +200,7 @@ class Game(BaseModel):
                 time_left -= (datetime.now() - self.date_state).total_seconds()
             return time_left
         if self.type_game == consts.TYPE_FAST:
-            moves = self.moves.select(Move.time_move).where(Move.color == color)
-            time_spent = sum([m.time_move for m in moves])
+            time_spent = self.time_spent(color)
             time_left = self.time_limit - time_spent
             if self.next_color == color:
                 time_left -= (datetime.now() - self.date_state).total_seconds()
@@ -187,6 +212,9 @@ class Game(BaseModel):
             moves = moves.where(Move.color == color)
         return moves
 
+    def add_checkpoint(self, number, state):
+        return Checkpoint.create(game=self, number=number, state=state, cut=self.cut)
+
     def get_winner(self):
         if self.ended and self.winner:
             return consts.COLORS.get(self.winner)
@@ -202,6 +230,25 @@ class Move(BaseModel):
     time_move = peewee.FloatField()
     color = peewee.IntegerField()
 
+    class Meta:
+        indexes = (
+            (('game', 'number'), True),
+        )
+
+
+class Checkpoint(BaseModel):
+    # position after `number` moves, white moves on even numbers
+    pk = peewee.PrimaryKeyField()
+    game = peewee.ForeignKeyField(Game, related_name='checkpoints', on_delete='CASCADE')
+    number = peewee.IntegerField()
+    state = peewee.CharField()
+    cut = peewee.CharField(default='')
+
+    class Meta:
+        indexes = (
+            (('game', 'number'), True),
+        )
+
 
 class Chat(BaseModel):
     pk = peewee.PrimaryKeyField()
@@ -231,7 +278,7 @@ class GamePool(BaseModel):
 
 if __name__ == '__main__':
     config.DB.connect()
-    TABLES = [User, Game, Move, Chat, ChatMessage, GamePool]
+    TABLES = [User, Game, Move, Checkpoint, Chat, ChatMessage, GamePool]
     added = []
     for table in TABLES:
         if not table.table_exists():
@@ -0,0 +1,50 @@
+import errors
+import models
+from consts import WHITE, BLACK
+from game import load_engine
+from helpers import coors2pos
+
+
+def load_checkpoint(model, number):
+    # engine game at the nearest checkpoint before or at number
+    checkpoint = model.checkpoints.where(
+        models.Checkpoint.number <= number
+    ).order_by(models.Checkpoint.number.desc()).first()
+    if checkpoint is None:
+        return 0, load_engine(None, WHITE, '')
+    color = WHITE if checkpoint.number % 2 == 0 else BLACK
+    return checkpoint.number, load_engine(checkpoint.state, color, checkpoint.cut)
+
+
+def apply_move(game, move):
+    color = game.current_player
+    if move.startswith('0-0'):
+        y = 1 if color == WHITE else 8
+        pos1, pos2 = (5, y), (7 if move == '0-0' else 3, y)
+    else:
+        pos1, pos2 = map(coors2pos, move.split('-'))
+    try:
+        game.move(color, pos1, pos2)
+    except errors.EndGame:
+        pass
+
+
+def positions(model, first=0, last=None):
+    # yields (number, engine game) with positions after moves first..last,
+    # the same engine game is moved forward, clone it to keep a position
+    number, game = load_checkpoint(model, first)
+    if number == first:
+        yield number, game
+    moves = model.get_moves().where(models.Move.number > number)
+    if last is not None:
+        moves = moves.where(models.Move.number <= last)
+    for move in moves:
+        apply_move(game, move.move)
+        if move.number >= first:
+            yield move.number, game
+
+
+def position(model, number):
+    # engine game after number moves, None if game has less moves
+    for num, game in positions(model, number, number):
+        return game
@@ -0,0 +1,79 @@
+import time
+from datetime import datetime
+
+import config
+import consts
+import errors
+import models
+from cache import get_scheduled, schedule, unschedule
+from game import Game
+from helpers import get_queue_name
+from loggers import getLogger
+
+
+logger = getLogger(__name__)
+
+
+def schedule_active():
+    # games started before the scheduler, scheduling again is harmless
+    query = models.Game.select().where(
+        models.Game.date_end.is_null(), models.Game.type_game != consts.TYPE_NOLIMIT
+    )
+    count = 0
+    for model in query:
+        game = Game(model.white, model.black)
+        game.model = model
+        try:
+            game.schedule_clock()
+        except Exception as e:
+            logger.error('clock of {} failed: {}'.format(model.white, e))
+            continue
+        count += 1
+    return count
+
+
+def expire(token, now):
+    try:
+        game = Game.load_game(token)
+    except errors.GameNotFoundError:
+        # loading raises it for any error, only deleted games are dropped
+        if models.Game.select().where(models.Game.white == token).exists():
+            raise
+        return False
+    # loading may have ended it already
+    if game.model.ended:
+        return True
+    if game.check_time(datetime.fromtimestamp(now)):
+        return True
+    # a move came after the deadline was read
+    game.schedule_clock()
+    return False
+
+
+def expire_due(now, batch=None):
+    key = get_queue_name(consts.CLOCK_QUEUE)
+    tokens = get_scheduled(key, now, batch or config.CLOCK_BATCH)
+    expired = 0
+    for token in tokens:
+        # other schedulers may take the same game
+        if not unschedule(key, token):
+            continue
+        try:
+            expired += expire(token, now)
+        except Exception as e:
+            logger.error('clock of {} failed: {}'.format(token, e))
+            # the game is not lost, it is tried again later
+            schedule(key, token, now + config.CLOCK_RETRY)
+    return len(tokens), expired
+
+
+def run(clock=time.time, sleep=time.sleep):
+    schedule_active()
+    while True:
+        found, expired = expire_due(clock())
+        if found < config.CLOCK_BATCH:
+            sleep(config.CLOCK_INTERVAL)
+
+
+if __name__ == '__main__':
+    run()
@@ -1,15 +1,17 @@
 import logging
-from functools import reduce
 
 from flask import jsonify
 
 from consts import FIGURES, COLORS, UNKNOWN
 from helpers import pos2coors
+from engine import mask2cells
 import config
 
 
 logger = logging.getLogger(__name__)
 
+ALL_CELLS = (1 << 64) - 1
+
 
 class BaseSerializer(object):
     def __init__(self, model, color=UNKNOWN):
@@ -46,20 +48,11 @@ class BoardSerializer(BaseSerializer):
     def calc(self):
         data = {}
         if self._color == UNKNOWN:
-            figures = [f for f in self._model.figures]
+            mask = ALL_CELLS
         else:
-            figures = [f for f in self._model.figures if f.color == self._color]
-        cells = reduce(lambda a, b: a + b, [f.getVisibleCells() for f in figures])
-        for cell in cells:
+            mask = self._model.visibility(self._color)
+        for cell in mask2cells(mask):
             data[pos2coors(*cell)] = FigureSerializer(self._model.cell2Figure(*cell)).calc()
-        for fig in figures:
-            data[pos2coors(fig.x, fig.y)] = FigureSerializer(fig).calc()
-        if self._color == UNKNOWN:
-            for x in range(1, 9):
-                for y in range(1, 9):
-                    coor = pos2coors(x, y)
-                    if coor not in data:
-                        data[coor] = {}
         data['cuts'] = []
         for fig in self._model.cuts:
             data['cuts'].append({
@@ -73,7 +66,7 @@ class GameSerializer(BaseSerializer):
     def calc(self):
         return {
             'moves': [(
-                m['figure'].symbol,
+                m['symbol'],
                 pos2coors(m['x1'], m['y1']),
                 pos2coors(m['x2'], m['y2'])
             ) for m in self._model.moves],
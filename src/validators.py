@@ -124,6 +124,21 @@ class GameNewValidator(BaseValidator):
         return super(GameNewValidator, self).is_valid()
 
 
+class GameComputerValidator(GameNewValidator):
+    fields = dict(GameNewValidator.fields, level=dict(type=int, default=config.BOT_DEFAULT_LEVEL))
+    cleaned_fields = dict(GameNewValidator.cleaned_fields, level=dict(type=int))
+
+    def is_valid(self):
+        if self.form['level'] not in config.BOT_LEVELS:
+            return self.error('level must be one of {}'.format(
+                ', '.join(map(str, sorted(config.BOT_LEVELS)))
+            ))
+        if not super(GameComputerValidator, self).is_valid():
+            return False
+        self.cleaned_data['level'] = self.form['level']
+        return True
+
+
 class GameMoveValidator(BaseValidator):
     fields = {
         'move': dict(type=str, required=True)
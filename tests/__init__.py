@@ -1,6 +1,8 @@
 import sys
 sys.path.insert(0, 'src')
 
+from tests.bitboard_t import *
+from tests.bot_t import *
 from tests.cache_t import *
 from tests.connections_t import *
 from tests.decorators_t import *
@@ -12,6 +14,10 @@ from tests.handlers.v2.auth_t import *
 from tests.handlers.v2.game_t import *
 from tests.handlers.v2.chat_t import *
 from tests.helpers_t import *
+from tests.lru_t import *
+from tests.migrate_t import *
 from tests.models_t import *
+from tests.replay_t import *
+from tests.scheduler_t import *
 from tests.serializers_t import *
 from tests.validators_t import *
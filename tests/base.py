@@ -13,6 +13,7 @@ from playhouse.test_utils import test_database
 from app import app
 import cache
 import connections
+import game
 from models import User, Game, Move
 
 
@@ -59,6 +60,8 @@ class TestCaseDB(TestCaseCache):
             m[1] for m in inspect.getmembers(sys.modules['models'], inspect.isclass)
             if issubclass(m[1], Model) and m[1] != Model
         ]
+        # database and redis are new for every test, so tokens must not hit old games
+        game.SESSION_CACHE.clear()
         with test_database(test_db, model_classes):
             super(TestCaseDB, self).run(result)
 
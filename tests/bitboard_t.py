@@ -0,0 +1,54 @@
+from tests import engine_t
+from consts import WHITE, BLACK, PAWN, ROOK, KING, QUEEN
+from bitboard import BitBoard, mask2cells
+
+
+class TestBitBoardFigure(engine_t.TestFigure):
+    board_class = BitBoard
+
+
+class TestBitBoardFiguresMoves(engine_t.TestFiguresMoves):
+    board_class = BitBoard
+
+
+class TestBitBoardKing(engine_t.TestKing):
+    board_class = BitBoard
+
+
+class TestBitBoardPawn(engine_t.TestPawn):
+    board_class = BitBoard
+
+
+class TestBitBoardBoard(engine_t.TestBoard):
+    board_class = BitBoard
+
+    def check_cells(self, board):
+        super(TestBitBoardBoard, self).check_cells(board)
+        for color in (WHITE, BLACK):
+            cells = [(f.x, f.y) for f in board.figures if f.color == color]
+            self.assertEqual(sorted(mask2cells(board.pieces(color))), sorted(cells))
+
+    def test_pieces(self):
+        board = BitBoard('Ke1,Pe2,Pd3,ke8')
+        self.assertEqual(mask2cells(board.pieces(WHITE, PAWN)), [(5, 2), (4, 3)])
+        self.assertEqual(mask2cells(board.pieces(BLACK, KING)), [(5, 8)])
+        self.assertEqual(board.pieces(BLACK, QUEEN), 0)
+
+    def test_lazy_moves(self):
+        board = BitBoard('Ke1,Ra1,Pa2,Ph2,ke8,pa7')
+        self.assertTrue(all(fig._moves is None for fig in board.figures))
+        rook = board.getFigure(WHITE, ROOK)
+        pawn = board.getFigure(WHITE, PAWN, 1)
+        moves = pawn.getMoves()
+        self.assertEqual(rook.getMoves(), [(2, 1), (3, 1), (4, 1)])
+        board.getFigure(WHITE, PAWN).move(1, 4)
+        # only figures watching changed cells are generated again
+        self.assertIs(pawn.getMoves(), moves)
+        self.assertIsNone(rook._moves)
+        self.assertEqual(sorted(rook.getMoves()), [(1, 2), (1, 3), (2, 1), (3, 1), (4, 1)])
+        board.pop()
+        self.assertEqual(rook.getMoves(), [(2, 1), (3, 1), (4, 1)])
+
+
+class TestBitBoardGame(engine_t.TestGame):
+    board_class = BitBoard
@@ -0,0 +1,62 @@
+import random
+import time
+from unittest.mock import patch
+
+import models
+from tests.base import TestCaseBase, TestCaseDB
+from consts import WHITE, BLACK, COMPUTER_QUEUE
+from bot import determinize, search, choose_move, play
+from cache import get_from_queue
+from engine import Board
+from game import Game
+from helpers import computer_token
+
+
+class TestBot(TestCaseBase):
+
+    def test_determinize(self):
+        board = Board()
+        sample = determinize(board, WHITE, random.Random(1))
+        figures = [str(fig) for fig in sample.figures]
+        self.assertEqual(len(figures), 32)
+        for fig in board.figures:
+            if fig.color == WHITE:
+                self.assertIn(str(fig), figures)
+        for fig in sample.figures:
+            if fig.color == BLACK:
+                self.assertGreater(fig.y, 4)
+        # cut figures are not placed
+        board = Board('Ke1,Pe2,ke8,qd8,pa7', 'rnbPP', BLACK)
+        sample = determinize(board, BLACK, random.Random(1))
+        self.assertEqual(sorted(fig.symbol for fig in sample.figures if fig.color == WHITE),
+                         ['B', 'B', 'K', 'N', 'N', 'P', 'P', 'P', 'P', 'P', 'P', 'Q', 'R', 'R'])
+
+    def test_search(self):
+        # take the king
+        score, move = search(Board('Ke1,Rh1,kh8,pa7'), WHITE, 1, 3)
+        self.assertEqual(move, (8, 1, 8, 8))
+        # take the queen
+        score, move = search(Board('Ke1,Qd4,ke8,pa7,rg4', color=BLACK), BLACK, 1, 2)
+        self.assertEqual(move, (7, 4, 4, 4))
+
+    def test_choose_move(self):
+        board = Board()
+        started = time.perf_counter()
+        (x1, y1), (x2, y2) = choose_move(board, WHITE, 1, rnd=random.Random(1))
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertIn((x2, y2), board.cell2Figure(x1, y1).getMoves())
+
+
+class TestPlay(TestCaseDB):
+
+    def test_play(self):
+        token = computer_token(1)
+        with patch('game.send_ws'):
+            Game.new_game('1234', token, 1, None)
+            self.assertIsNone(get_from_queue(COMPUTER_QUEUE))
+            Game.load_game('1234').move('e2', 'e4')
+            self.assertEqual(get_from_queue(COMPUTER_QUEUE), token)
+            # not computer turn
+            self.assertFalse(play('1234'))
+            self.assertTrue(play(token))
+        self.assertEqual(models.Game.get_game(token).next_color, WHITE)
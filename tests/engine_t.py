@@ -2,12 +2,27 @@ import unittest
 
 import errors
 from tests.base import TestCaseBase
-from consts import WHITE, BLACK, PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING
+from consts import (
+    WHITE, BLACK, PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING, CASTLE_WHITE_SHORT
+)
 from helpers import coors2pos
-from engine import Figure, Pawn, Rook, Knight, Bishop, Queen, King, Board, Game
+from engine import (
+    Figure, Pawn, Rook, Knight, Bishop, Queen, King, Board, Game, perft,
+    LINE_CELLS, KNIGHT_CELLS, KING_CELLS, PROCESS_STATS, moveCells, moveCoors
+)
 
 
-class TestFigure(TestCaseBase):
+class TestCaseEngine(TestCaseBase):
+    board_class = Board
+
+    def new_board(self, *args, **kwargs):
+        return self.board_class(*args, **kwargs)
+
+    def new_game(self, *args, **kwargs):
+        return Game(*args, board_class=self.board_class, **kwargs)
+
+
+class TestFigure(TestCaseEngine):
 
     def test_symbol(self):
         self.assertEqual(str(Figure(1, 1, WHITE, None)), '?a1')
@@ -31,14 +46,14 @@ class TestFigure(TestCaseBase):
         self.assertFalse(figure.isFriend(Figure(2, 2, BLACK, None)))
 
     def test_getLineMoves(self):
-        board = Board()
+        board = self.new_board()
         figure = Figure(5, 5, WHITE, board)
         self.assertEqual(figure.getLineMoves([(0, 0)]), [])
         self.assertEqual(figure.getLineMoves([(0, 1)]), [(5, 6), (5, 7)])
         self.assertEqual(figure.getLineMoves([(0, -1)]), [(5, 4), (5, 3)])
 
     def test_make_move(self):
-        board = Board()
+        board = self.new_board()
         figure = board.getFigure(WHITE, PAWN, 0)
         self.assertFalse(figure.moved)
         with self.assertRaises(errors.WrongMoveError):
@@ -47,23 +62,23 @@ class TestFigure(TestCaseBase):
         self.assertTrue(figure.moved)
 
     def test_terminate(self):
-        board = Board()
+        board = self.new_board()
         figure = board.getFigure(WHITE, PAWN, 0)
         self.assertEqual(len(board._figures[WHITE][PAWN]), 8)
         figure.terminate()
         self.assertEqual(len(board._figures[WHITE][PAWN]), 7)
 
 
-class TestFiguresMoves(TestCaseBase):
+class TestFiguresMoves(TestCaseEngine):
 
     def check_cases(self, color, kind, cases):
         for (board, results) in cases:
-            figure = Board(board).getFigure(color, kind)
+            figure = self.new_board(board).getFigure(color, kind)
             self.assertEqual(sorted(figure.getMoves()), sorted(map(coors2pos, results)))
 
     def check_cases_visible(self, color, kind, cases):
         for (board, results) in cases:
-            figure = Board(board).getFigure(color, kind)
+            figure = self.new_board(board).getFigure(color, kind)
             self.assertEqual(sorted(figure.getVisibleCells()), sorted(map(coors2pos, results)))
 
     def test_Pawn(self):
@@ -147,64 +162,71 @@ class TestFiguresMoves(TestCaseBase):
         self.check_cases(WHITE, KING, cases)
 
 
-class TestKing(TestCaseBase):
+class TestKing(TestCaseEngine):
 
     # aura isn't required
     @unittest.skip
     def test_aura(self):
         results = ['d5', 'e5', 'f5', 'f4', 'f3', 'e3', 'd3', 'd4']
-        king = Board('Ke4,Pd3,Rf3,nd5,re6').getFigure(WHITE, KING)
+        king = self.new_board('Ke4,Pd3,Rf3,nd5,re6').getFigure(WHITE, KING)
         self.assertEqual(sorted(king.royalAura()), sorted(map(coors2pos, results)))
 
     def test_can_castle_1(self):
         # check for white after move
-        king = Board('Kd1,Rh1,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Kd1,Rh1,ke8').getFigure(WHITE, KING)
         king.move(5, 1)
         self.assertFalse(king.can_castle())
-        king = Board('Ke1,Rh2,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Ke1,Rh2,ke8').getFigure(WHITE, KING)
         king.board.getFigure(WHITE, ROOK).move(8, 1)
         self.assertFalse(king.can_castle())
         # short castle
-        king = Board('Ke1,Rh1,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Ke1,Rh1,ke8').getFigure(WHITE, KING)
         self.assertIsInstance(king.can_castle(), Rook)
         self.assertFalse(king.can_castle(False))
         # short castle with barrier
-        king = Board('Ke1,Rh1,Bf1,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Ke1,Rh1,Bf1,ke8').getFigure(WHITE, KING)
         self.assertFalse(king.can_castle())
         # long castle
-        king = Board('Ke1,Ra1,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Ke1,Ra1,ke8').getFigure(WHITE, KING)
         self.assertIsInstance(king.can_castle(False), Rook)
         self.assertFalse(king.can_castle())
         # long castle with barrier
-        king = Board('Ke1,Ra1,Bc1,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Ke1,Ra1,Bc1,ke8').getFigure(WHITE, KING)
+        self.assertFalse(king.can_castle(False))
+        # no own rook in corner or king is not at home
+        king = self.new_board('Ke1,Qa1,rh1,ke8').getFigure(WHITE, KING)
+        self.assertFalse(king.can_castle(True))
+        self.assertFalse(king.can_castle(False))
+        king = self.new_board('Kd1,Ra1,Rh1,ke8').getFigure(WHITE, KING)
+        self.assertFalse(king.can_castle(True))
         self.assertFalse(king.can_castle(False))
 
     def test_can_castle_2(self):
         # check for black after move
-        king = Board('Ke1,rh8,kd8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,rh8,kd8').getFigure(BLACK, KING)
         king.move(5, 8)
         self.assertFalse(king.can_castle())
-        king = Board('Ke1,rh7,ke8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,rh7,ke8').getFigure(BLACK, KING)
         king.board.getFigure(BLACK, ROOK).move(8, 8)
         self.assertFalse(king.can_castle())
         # short castle
-        king = Board('Ke1,rh8,ke8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,rh8,ke8').getFigure(BLACK, KING)
         self.assertIsInstance(king.can_castle(), Rook)
         self.assertFalse(king.can_castle(False))
         # short castle with barrier
-        king = Board('Ke1,rh8,bf8,ke8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,rh8,bf8,ke8').getFigure(BLACK, KING)
         self.assertFalse(king.can_castle())
         # long castle
-        king = Board('Ke1,ra8,ke8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,ra8,ke8').getFigure(BLACK, KING)
         self.assertIsInstance(king.can_castle(False), Rook)
         self.assertFalse(king.can_castle())
         # long castle with barrier
-        king = Board('Ke1,ra8,bc8,ke8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,ra8,bc8,ke8').getFigure(BLACK, KING)
         self.assertFalse(king.can_castle(False))
 
     def test_can_castle_3(self):
         # white: deny castle separately and check it
-        king = Board('Ke1,Rh1,Ra1,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Ke1,Rh1,Ra1,ke8').getFigure(WHITE, KING)
         self.assertTrue(king.can_castle(True))
         self.assertTrue(king.can_castle(False))
         king.board.denyCastle(WHITE, True)
@@ -214,7 +236,7 @@ class TestKing(TestCaseBase):
         self.assertFalse(king.can_castle(True))
         self.assertFalse(king.can_castle(False))
         # white: deny castle both and check it
-        king = Board('Ke1,Rh1,Ra1,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Ke1,Rh1,Ra1,ke8').getFigure(WHITE, KING)
         self.assertTrue(king.can_castle(True))
         self.assertTrue(king.can_castle(False))
         king.board.denyCastle(WHITE)
@@ -223,7 +245,7 @@ class TestKing(TestCaseBase):
 
     def test_can_castle_4(self):
         # black: deny castle separately and check it
-        king = Board('Ke1,rh8,ra8,ke8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,rh8,ra8,ke8').getFigure(BLACK, KING)
         self.assertTrue(king.can_castle(True))
         self.assertTrue(king.can_castle(False))
         king.board.denyCastle(BLACK, True)
@@ -233,7 +255,7 @@ class TestKing(TestCaseBase):
         self.assertFalse(king.can_castle(True))
         self.assertFalse(king.can_castle(False))
         # black: deny castle both and check it
-        king = Board('Ke1,rh8,ra8,ke8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,rh8,ra8,ke8').getFigure(BLACK, KING)
         self.assertTrue(king.can_castle(True))
         self.assertTrue(king.can_castle(False))
         king.board.denyCastle(BLACK)
@@ -241,7 +263,7 @@ class TestKing(TestCaseBase):
         self.assertFalse(king.can_castle(False))
 
     def test_castle_1(self):
-        board = Board('Ke1,Rh1,ke8')
+        board = self.new_board('Ke1,Rh1,ke8')
         king = board.getFigure(WHITE, KING)
         rook = board.getFigure(WHITE, ROOK)
         self.assertEqual(str(king), 'Ke1')
@@ -251,7 +273,7 @@ class TestKing(TestCaseBase):
         self.assertEqual(str(rook), 'Rf1')
 
     def test_castle_2(self):
-        board = Board('Ke1,Rh1,Ng1,ke8')
+        board = self.new_board('Ke1,Rh1,Ng1,ke8')
         king = board.getFigure(WHITE, KING)
         rook = board.getFigure(WHITE, ROOK)
         self.assertEqual(str(king), 'Ke1')
@@ -263,12 +285,12 @@ class TestKing(TestCaseBase):
 
     def test_try_to_castle_white(self):
         # short castle
-        king = Board('Ke1,Rh1,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Ke1,Rh1,ke8').getFigure(WHITE, KING)
         self.assertFalse(king.try_to_castle(6, 1))
         self.assertFalse(king.try_to_castle(8, 1))
         self.assertEqual(king.try_to_castle(7, 1), '0-0')
         # long castle
-        king = Board('Ke1,Ra1,ke8').getFigure(WHITE, KING)
+        king = self.new_board('Ke1,Ra1,ke8').getFigure(WHITE, KING)
         self.assertFalse(king.try_to_castle(1, 1))
         self.assertFalse(king.try_to_castle(2, 1))
         self.assertFalse(king.try_to_castle(4, 1))
@@ -276,22 +298,22 @@ class TestKing(TestCaseBase):
 
     def test_try_to_castle_black(self):
         # short castle
-        king = Board('Ke1,rh8,ke8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,rh8,ke8').getFigure(BLACK, KING)
         self.assertFalse(king.try_to_castle(6, 8))
         self.assertFalse(king.try_to_castle(8, 8))
         self.assertEqual(king.try_to_castle(7, 8), '0-0')
         # long castle
-        king = Board('Ke1,ra8,ke8').getFigure(BLACK, KING)
+        king = self.new_board('Ke1,ra8,ke8').getFigure(BLACK, KING)
         self.assertFalse(king.try_to_castle(1, 8))
         self.assertFalse(king.try_to_castle(2, 8))
         self.assertFalse(king.try_to_castle(4, 8))
         self.assertEqual(king.try_to_castle(3, 8), '0-0-0')
 
 
-class TestPawn(TestCaseBase):
+class TestPawn(TestCaseEngine):
 
     def test_move_1(self):
-        game = Game('Pc7,Ke1,ke8')
+        game = self.new_game('Pc7,Ke1,ke8')
         self.assertEqual(str(game.board.getFigure(WHITE, PAWN)), 'Pc7')
         with self.assertRaises(errors.NotFoundError):
             game.board.getFigure(WHITE, QUEEN)
@@ -302,7 +324,7 @@ class TestPawn(TestCaseBase):
             game.board.getFigure(WHITE, PAWN)
 
     def test_move_2(self):
-        game = Game('pc2,Ke1,ke8', BLACK)
+        game = self.new_game('pc2,Ke1,ke8', BLACK)
         self.assertEqual(str(game.board.getFigure(BLACK, PAWN)), 'pc2')
         with self.assertRaises(errors.NotFoundError):
             game.board.getFigure(BLACK, QUEEN)
@@ -313,10 +335,260 @@ class TestPawn(TestCaseBase):
             game.board.getFigure(BLACK, PAWN)
 
 
-class TestGame(TestCaseBase):
+class TestBoard(TestCaseEngine):
+
+    def check_cells(self, board):
+        cells = {(fig.x, fig.y): fig for fig in board.figures}
+        for x in range(1, 9):
+            for y in range(1, 9):
+                self.assertIs(board.cell2Figure(x, y), cells.get((x, y)))
+
+    def test_cells_tables(self):
+        self.assertEqual(KNIGHT_CELLS[0], (((2, 3), 17), ((3, 2), 10)))
+        self.assertEqual(len(KING_CELLS[27]), 8)
+        self.assertEqual([cell for cell, i in LINE_CELLS[1, 1][0]], [(x, x) for x in range(2, 9)])
+        self.assertEqual(LINE_CELLS[-1, 0][0], ())
+        for line in LINE_CELLS.values():
+            for cells in line:
+                for (x, y), i in cells:
+                    self.assertEqual(i, (y - 1) * 8 + x - 1)
+
+    def test_clone(self):
+        board = self.new_board('Ke1,Ra1,Rh1,Pb7,ke8,nc8,rh8', 'Q', BLACK)
+        board.push(board.getFigure(BLACK, ROOK), 8, 2)
+        board.denyCastle(WHITE, True)
+        moves = board.getFigure(WHITE, KING).getMoves()
+        clone = board.clone()
+        self.assertIs(clone.getFigure(WHITE, KING).getMoves(), moves)
+        self.assertIs(clone.getFigure(WHITE, KING).board, clone)
+        self.assertIsInstance(clone, self.board_class)
+        self.assertEqual(str(clone), str(board))
+        self.assertEqual(clone.hash, board.hash)
+        self.assertEqual(clone.castles, board.castles)
+        self.assertEqual(clone.cuts, board.cuts)
+        self.assertEqual(clone.moves, board.moves)
+        self.check_cells(clone)
+        # clone does not change original
+        clone.push(clone.getFigure(WHITE, PAWN), 3, 8)
+        self.assertEqual(str(board), 'Ke1,Ra1,Rh1,Pb7,ke8,nc8,rh2')
+        self.assertEqual(board.cuts, [(QUEEN, WHITE)])
+        self.assertEqual({str(fig): sorted(fig.getMoves()) for fig in board.figures},
+                         {str(fig): sorted(fig.getMoves()) for fig in board.clone().figures})
+
+    def test_stats(self):
+        board = self.new_board('Ke1,Ra1,Pb2,ke8,pa3')
+        self.assertIsNone(board.stats)
+        stats = board.enableStats()
+        self.assertIs(board.enableStats(), stats)
+        self.assertIsInstance(board, self.board_class)
+        PROCESS_STATS.clear()
+        for fig in board.figures:
+            fig.getMoves()
+        board.push(board.getFigure(WHITE, PAWN), 1, 3)
+        for fig in board.figures:
+            fig.getMoves()
+        calls = stats.counts['cell2Figure']
+        with self.assertRaises(errors.OutOfBoardError):
+            board.cell2Figure(9, 1)
+        report = stats.report()
+        self.assertEqual(report['counts']['moves'], 1)
+        self.assertEqual(report['counts']['cell2Figure'], calls + 1)
+        self.assertEqual(report['counts']['exceptions'], 1)
+        self.assertGreater(report['counts']['regenerated'], 0)
+        self.assertGreater(report['updates']['Rook'], 0)
+        self.assertEqual(set(report['times']), {'move', 'updateFigures', 'checkDraw'})
+        self.assertEqual(PROCESS_STATS.counts, stats.counts)
+        # clone counts separately
+        clone = board.clone()
+        self.assertEqual(clone.stats.counts, {})
+        clone.push(clone.getFigure(BLACK, KING), 5, 7)
+        self.assertEqual(stats.counts['moves'], 1)
+        self.assertEqual(PROCESS_STATS.counts['moves'], 2)
+        # Game.move raises end of game once
+        game = self.new_game('Ke1,Qe2,ke8')
+        game.board.enableStats()
+        with self.assertRaises(errors.WhiteWon):
+            game.move(WHITE, (5, 2), (5, 8))
+        self.assertEqual(game.board.stats.counts['exceptions'], 1)
+
+    def test_legalMoves(self):
+        board = self.new_board()
+        moves = board.legalMoves(WHITE)
+        self.assertEqual(len(moves), 20)
+        self.assertEqual(moves.typecode, 'H')
+        self.assertIn('e2-e4', map(moveCoors, moves))
+        self.assertIn(((2, 1), (3, 3)), map(moveCells, moves))
+        board = self.new_board('Ke1,Pa4,pa5,nb8')
+        self.assertEqual(sorted(board.legalMoves(BLACK)), [57 << 6 | 40, 57 << 6 | 42, 57 << 6 | 51])
+        self.assertEqual(moveCoors(57 << 6 | 51), 'b8-d7')
+
+    def test_hasMoves(self):
+        board = self.new_board('Ke1,Pa4,pa5')
+        self.assertTrue(board.hasMoves(WHITE))
+        self.assertFalse(board.hasMoves(BLACK))
+        self.assertIsNone(board.checkDraw(BLACK))
+        self.assertEqual(board.checkDraw(WHITE), errors.Draw)
+        for state in ('Ke1,Ra1,Nb1,Pa2,Pb2,Pc2', 'Ra1,Bb1,Pa2,Pb2,pa3,pb3,ke8', 'Qa1,Pa2,Pb2,Pb1,pa3,pb3'):
+            board = self.new_board(state)
+            for color in (WHITE, BLACK):
+                moves = [move for fig in board.figures if fig.color == color for move in fig.getMoves()]
+                self.assertEqual(self.new_board(state).hasMoves(color), bool(moves))
+
+    def test_visibility(self):
+        board = self.new_board()
+        self.assertEqual(board.visibility(WHITE), 0xffffffff)
+        self.assertEqual(board.visibility(BLACK), 0xffffffff << 32)
+        pawn = board.getFigure(WHITE, PAWN, 4)
+        board.push(pawn, 5, 4)
+        board.push(board.getFigure(BLACK, PAWN, 3), 4, 5)
+        for color in (WHITE, BLACK):
+            cells = set()
+            for fig in board.figures:
+                if fig.color == color:
+                    cells.add((fig.x, fig.y))
+                    cells.update(fig.getVisibleCells())
+            mask = sum(1 << ((y - 1) * 8 + x - 1) for x, y in cells)
+            self.assertEqual(board.visibility(color), mask)
+        self.assertTrue(board.visibility(WHITE) & 1 << 35)
+        board.pop()
+        board.pop()
+        self.assertEqual(board.visibility(WHITE), 0xffffffff)
+
+    def test_cell2Figure(self):
+        board = self.new_board()
+        self.check_cells(board)
+        self.assertEqual(str(board.cell2Figure(5, 1)), 'Ke1')
+        self.assertIsNone(board.cell2Figure(5, 4))
+        with self.assertRaises(errors.OutOfBoardError):
+            board.cell2Figure(0, 4)
+        # move and cut
+        board = self.new_board('Ke1,Rh1,Pa7,ke8,nb8')
+        board.getFigure(WHITE, PAWN).move(2, 8)
+        self.assertEqual(str(board.cell2Figure(2, 8)), 'Qb8')
+        self.assertIsNone(board.cell2Figure(1, 7))
+        self.check_cells(board)
+        # castle
+        board.getFigure(WHITE, KING).castle()
+        self.assertIsNone(board.cell2Figure(5, 1))
+        self.assertIsNone(board.cell2Figure(8, 1))
+        self.assertEqual(str(board.cell2Figure(7, 1)), 'Kg1')
+        self.assertEqual(str(board.cell2Figure(6, 1)), 'Rf1')
+        self.check_cells(board)
+
+    def test_updateFigures(self):
+        board = self.new_board('Ke1,Ra1,Rh1,Pa2,Nb1,ke8,pa7,rh8')
+        board.check_updates = True
+        moves = {str(fig): fig.getMoves() for fig in board.figures}
+        pawn = board.getFigure(WHITE, PAWN)
+        pawn.move(1, 4)
+        self.assertEqual(board.getFigure(WHITE, ROOK, 1).getMoves(), moves['Rh1'])
+        self.assertEqual(board.getFigure(BLACK, ROOK).getMoves(), moves['rh8'])
+        self.assertEqual(sorted(pawn.getMoves()), [(1, 5)])
+        self.assertEqual(sorted(board.getFigure(BLACK, PAWN).getMoves()), [(1, 5), (1, 6)])
+        board.getFigure(WHITE, KNIGHT).move(3, 3)
+        self.assertIn((3, 1), board.getFigure(WHITE, KING).getMoves())
+        board.getFigure(BLACK, ROOK).move(8, 1)
+        self.assertNotIn((7, 1), board.getFigure(WHITE, KING).getMoves())
+        board.denyCastle(WHITE)
+        self.assertNotIn((3, 1), board.getFigure(WHITE, KING).getMoves())
+        board.checkFigures()
+
+    def test_hash(self):
+        board = self.new_board()
+        initial = board.hash
+        self.assertEqual(self.new_board().hash, initial)
+        self.assertNotEqual(self.new_board(None, [], BLACK).hash, initial)
+        self.assertNotEqual(self.new_board(None, 'p').hash, initial)
+        self.assertNotEqual(self.new_board(None, 'pp').hash, self.new_board(None, 'p').hash)
+        # transposition gives the same hash
+        hashes = set()
+        for x1, y1, x2, y2 in ((7, 1, 6, 3), (7, 8, 6, 6), (6, 3, 7, 1), (6, 6, 7, 8)):
+            hashes.add(board.hash)
+            board.push(board.cell2Figure(x1, y1), x2, y2)
+        self.assertEqual(len(hashes), 4)
+        self.assertEqual(board.hash, initial)
+        board.push(board.cell2Figure(5, 2), 5, 4)
+        self.assertNotIn(board.hash, hashes)
+        board.pop()
+        self.assertEqual(board.hash, initial)
+        # castling rights
+        board = self.new_board('Ke1,Rh1,ke8')
+        self.assertEqual(board.castles, CASTLE_WHITE_SHORT)
+        hash = board.hash
+        board.denyCastle(WHITE, True)
+        self.assertEqual(board.castles, 0)
+        self.assertNotEqual(board.hash, hash)
+        board.fillCells()
+        self.assertNotEqual(board.hash, hash)
+
+    def test_push_pop(self):
+        board = self.new_board('Ke1,Ra1,Rh1,Pb7,ke8,nc8,rh8', 'Q')
+        moves = {str(fig): sorted(fig.getMoves()) for fig in board.figures}
+        king = board.getFigure(WHITE, KING)
+        pawn = board.getFigure(WHITE, PAWN)
+        # promotion with cut
+        self.assertIsNone(board.push(pawn, 3, 8))
+        self.assertEqual(str(board), 'Ke1,Ra1,Rh1,ke8,rh8,Qc8')
+        self.assertEqual(board.cuts, [(QUEEN, WHITE), (KNIGHT, BLACK)])
+        # castle
+        self.assertIsNone(board.push(king, 7, 1))
+        self.assertEqual(str(board), 'Kg1,Ra1,Rf1,ke8,rh8,Qc8')
+        self.assertTrue(king.moved)
+        # cut of king
+        rook = board.getFigure(BLACK, ROOK)
+        self.assertIs(board.push(rook, 8, 1), None)
+        self.assertIs(board.push(board.getFigure(WHITE, QUEEN), 5, 8), errors.WhiteWon)
+        for i in range(4):
+            board.pop()
+        self.assertEqual(str(board), 'Ke1,Ra1,Rh1,Pb7,ke8,nc8,rh8')
+        self.assertEqual(board.cuts, [(QUEEN, WHITE)])
+        self.assertIsNone(board.lastCut)
+        self.assertFalse(king.moved)
+        self.assertEqual(board.moves, [])
+        self.assertEqual({str(fig): sorted(fig.getMoves()) for fig in board.figures}, moves)
+        self.check_cells(board)
+
+    def test_history(self):
+        board = self.new_board('Ke1,Ng1,ke8,ng8')
+        board.history_limit = 2
+        knights = [board.getFigure(WHITE, KNIGHT), board.getFigure(BLACK, KNIGHT)]
+        cells = [(6, 3), (6, 6), (7, 1), (7, 8)]
+        for i in range(12):
+            board.push(knights[i % 2], *cells[i % 4])
+        self.assertEqual(board.moves, [
+            {'symbol': 'N', 'x1': 6, 'y1': 3, 'x2': 7, 'y2': 1},
+            {'symbol': 'n', 'x1': 6, 'y1': 6, 'x2': 7, 'y2': 8},
+        ])
+        self.assertLessEqual(len(board._undo), 4)
+        board.pop()
+        self.assertEqual(board.moves[-1]['symbol'], 'N')
+        self.assertEqual(str(board), 'Ke1,Ng1,ke8,nf6')
+
+    def test_pack(self):
+        board = self.new_board()
+        state = board.pack()
+        self.assertTrue(state.startswith('~'))
+        self.assertLess(len(state), len(str(board)))
+        packed = self.new_board(state)
+        self.assertEqual(sorted(str(packed).split(',')), sorted(str(board).split(',')))
+        self.assertEqual(packed.hash, board.hash)
+        self.assertEqual(packed.pack(), state)
+        self.check_cells(packed)
+        # castles and color
+        board = self.new_board('Ke1,Ra1,Rh1,Pb2,ke8,ra8,rh8', 'Qn', BLACK)
+        board.denyCastle(WHITE, False)
+        board.denyCastle(BLACK)
+        packed = self.new_board(board.pack(), 'Qn')
+        self.assertEqual(packed.color, BLACK)
+        self.assertEqual(packed.castles, CASTLE_WHITE_SHORT)
+        self.assertEqual(packed.hash, board.hash)
+        self.assertEqual(str(self.new_board(str(packed))), str(packed))
+
+
+class TestGame(TestCaseEngine):
 
     def test_move(self):
-        game = Game('Kf3,Pe2,ke8,qf7')
+        game = self.new_game('Kf3,Pe2,ke8,qf7')
         self.assertEqual(game.current_player, WHITE)
         with self.assertRaises(errors.WrongTurnError):
             game.move(BLACK, (5, 4), (5, 5))
@@ -334,20 +606,51 @@ class TestGame(TestCaseBase):
             game.move(BLACK, (6, 7), (6, 3))
         self.assertIsInstance(cm.exception.figure, Queen)
         self.assertEqual(cm.exception.move, 'f7-f3')
+        self.assertEqual(game.current_player, BLACK)
         self.assertEqual(str(game.board.lastCut), 'Kf3')
-        game = Game('Ke1,Rh1,ke8')
+        game = self.new_game('Ke1,Rh1,ke8')
         fig, move = game.move(WHITE, (5, 1), (7, 1))
         self.assertIsInstance(fig, King)
         self.assertEqual(move, '0-0')
         self.assertEqual(game.current_player, BLACK)
 
+    def test_perft(self):
+        board = self.new_board()
+        self.assertEqual(perft(board, WHITE, 1), 20)
+        self.assertEqual(perft(board, WHITE, 3), 8902)
+        self.assertEqual(str(board), str(self.new_board()))
+        # castles are counted, king cut ends the branch
+        self.assertEqual(perft(self.new_board('Ke1,Ra1,Rh1,ke8'), WHITE, 1), 26)
+        self.assertEqual(perft(self.new_board('Ke1,Qe7,ke8'), BLACK, 2), 108)
+
+    def test_clone(self):
+        game = self.new_game()
+        game.move(WHITE, (5, 2), (5, 4))
+        clone = game.clone()
+        self.assertEqual(clone.current_player, BLACK)
+        clone.move(BLACK, (5, 7), (5, 5))
+        self.assertEqual(game.current_player, BLACK)
+        self.assertEqual(len(game.moves), 1)
+        self.assertEqual(len(clone.moves), 2)
+
+    def test_pop(self):
+        game = self.new_game('Pa2,Ph2,pa4,ph5')
+        game.move(WHITE, (8, 2), (8, 4))
+        with self.assertRaises(errors.Draw):
+            game.move(BLACK, (1, 4), (1, 3))
+        self.assertEqual(game.pop().color, BLACK)
+        self.assertEqual(game.current_player, BLACK)
+        self.assertEqual(game.pop().color, WHITE)
+        self.assertEqual(game.current_player, WHITE)
+        self.assertEqual(str(game.board), 'Pa2,Ph2,pa4,ph5')
+
     def test_full_game(self):
         moves = [
             'e2-e4', 'e7-e5', 'g1-f3', 'b8-c6', 'f1-c4', 'c6-d4', 'f3-e5',
             'd8-g5', 'e5-f7', 'g5-g2', 'h1-f1', 'g2-e4', 'c4-e2', 'd4-f3',
             'e2-f3', 'e4-e1'
         ]
-        game = Game()
+        game = self.new_game()
         with self.assertRaises(errors.BlackWon):
             for move in moves:
                 positions = map(coors2pos, move.split('-'))
@@ -2,15 +2,16 @@ import unittest
 from unittest.mock import patch, call
 from datetime import datetime
 
+import cache
 import models
 import errors
 from tests.base import TestCaseDB
 from consts import (
-    WHITE, BLACK, TYPE_NOLIMIT, PAWN, KING,
+    WHITE, BLACK, TYPE_NOLIMIT, PAWN, KING, CASTLE_WHITE_SHORT, CASTLE_BLACK_LONG,
     WS_START, WS_MOVE, WS_DRAW, WS_LOSE, WS_WIN, WS_DRAW_REQUEST,
     END_DRAW, END_RESIGN, END_CHECKMATE
 )
-from game import Game
+from game import Game, ENGINE_CACHE, SESSION_CACHE
 from cache import get_cache
 from format import format
 from engine import Board
@@ -241,6 +242,7 @@ class TestGame(TestCaseDB):
         with self.assertRaises(errors.OutOfBoardError):
             self.game.move('e9', 'e8', BLACK)
         # db error
+        state = str(self.game.game.board)
         with self.assertRaises(errors.BaseException):
             with patch('models.Game.add_move') as mock:
                 mock.side_effect = Exception('db error')
@@ -248,6 +250,8 @@ class TestGame(TestCaseDB):
                     self.game.move('e7', 'e5', BLACK)
         self.assertFalse(onMove.called)
         self.assertFalse(send_ws.called)
+        self.assertEqual(str(self.game.game.board), state)
+        self.assertEqual(self.game.game.current_player, BLACK)
         # move with ending game
         with patch('engine.Game.move') as mock:
             error = errors.BlackWon()
@@ -294,6 +298,43 @@ class TestGame(TestCaseDB):
             Game.load_game('1234').moves()
             Game.load_game('qwer').moves()
 
+    @patch('game.send_ws')
+    def test_stored_castles(self, send_ws):
+        self.game.game.board = Board('Ke1,Ra1,Rh1,ke8,ra8')
+        self.game.move('a1', 'a4', WHITE)
+        # text state has the rook back, stored rights still deny long castle
+        self.game.model.state = 'Ke1,Ra1,Rh1,ke8,ra8'
+        self.game.model.save()
+        self.assertEqual(self.game.model.castles, CASTLE_WHITE_SHORT | CASTLE_BLACK_LONG)
+        SESSION_CACHE.clear()
+        with patch('game.Game.check_castles') as mock:
+            game = Game.load_game('1234')
+            mock.assert_not_called()
+        self.assertEqual(game.game.board.castles, CASTLE_WHITE_SHORT | CASTLE_BLACK_LONG)
+        # games stored before castles take them from moves
+        models.Game.update(castles=None).execute()
+        SESSION_CACHE.clear()
+        with patch('game.Game.check_castles') as mock:
+            Game.load_game('1234')
+            self.assertEqual(mock.call_args_list, [call(WHITE), call(BLACK)])
+
+    @patch('game.send_ws')
+    def test_legacy_castles(self, send_ws):
+        # black king went back, text state looks like it can castle
+        self.game.game.board = Board('Ke1,Ra1,Rh1,ke8,ra8,rh8')
+        self.game.move('a1', 'a2', WHITE)
+        self.game.move('e8', 'e7', BLACK)
+        self.game.move('a2', 'a1', WHITE)
+        self.game.move('e7', 'e8', BLACK)
+        models.Game.update(castles=None).execute()
+        SESSION_CACHE.clear()
+        # white loads the game and its move stores rights of both colors
+        game = Game.load_game('1234')
+        game.move('a1', 'a2')
+        self.assertEqual(models.Game.get(pk=game.model.pk).castles, CASTLE_WHITE_SHORT)
+        SESSION_CACHE.clear()
+        self.assertEqual(Game.load_game('qwer').game.board.castles, CASTLE_WHITE_SHORT)
+
     def test_check_castles_1(self):
         # white: move king and check castles
         self.game.game.board = Board('Ke1,Ra1,Rh1,ke8')
@@ -374,6 +415,102 @@ class TestGame(TestCaseDB):
         self.assertIsNotNone(self.game.game.board.lastCut)
         self.assertEqual(self.game.game.board.cuts, [(PAWN, BLACK)])
         # load game and check cuts
+        SESSION_CACHE.clear()
         game = Game.load_game(self.game.model.white)
         self.assertIsNone(game.game.board.lastCut)
         self.assertEqual(game.game.board.cuts, [(PAWN, BLACK)])
+
+    def test_has_moves(self):
+        self.assertTrue(self.game.has_moves())
+        self.game.game.board = Board('Ke1,Pa4,pa5')
+        self.assertTrue(self.game.has_moves(WHITE))
+        self.assertFalse(self.game.has_moves(BLACK))
+
+    @patch.object(SESSION_CACHE, 'size', 0)
+    def test_engine_cache(self):
+        SESSION_CACHE.clear()
+        ENGINE_CACHE.clear()
+        first = Game.load_game('1234')
+        second = Game.load_game('1234')
+        self.assertEqual(ENGINE_CACHE.stats['misses'], 1)
+        self.assertEqual(ENGINE_CACHE.stats['hits'], 1)
+        self.assertIsNot(first.game.board, second.game.board)
+        state = str(second.game.board)
+        first.move('e2', 'e4')
+        self.assertEqual(str(second.game.board), state)
+        loaded = Game.load_game('qwer')
+        self.assertEqual(ENGINE_CACHE.stats['misses'], 2)
+        self.assertEqual(loaded.game.board.hash, first.game.board.hash)
+        # engine moves in a checked out copy do not touch the cached engine
+        loaded.game.move(BLACK, (5, 7), (5, 5))
+        self.assertEqual(Game.load_game('qwer').game.board.hash, first.game.board.hash)
+        self.assertEqual(ENGINE_CACHE.stats['hits'], 2)
+
+    @patch('game.send_ws')
+    @patch('models.Game.time_left')
+    @patch('game.BoardSerializer.calc')
+    def test_snapshot(self, board_calc, time_left, send_ws):
+        board_calc.return_value = {}
+        time_left.return_value = 10
+        game = Game.load_game('1234')
+        game.move('e2', 'e4')
+        # one board view for each color, clocks are shared
+        self.assertEqual(board_calc.call_count, 2)
+        self.assertEqual(time_left.call_count, 2)
+        game.get_info(BLACK)
+        self.assertEqual(board_calc.call_count, 2)
+        # next request computes clocks again
+        Game.load_game('1234').get_info()
+        self.assertEqual(time_left.call_count, 4)
+        # ended game shows the same board to both players
+        board_calc.reset_mock()
+        game.resign()
+        self.assertEqual(board_calc.call_count, 1)
+
+    @patch('game.send_ws')
+    def test_session_cache(self, send_ws):
+        SESSION_CACHE.clear()
+        white = Game.load_game('1234')
+        self.assertIs(Game.load_game('1234'), white)
+        black = Game.load_game('qwer')
+        self.assertIsNot(black, white)
+        # the process that moved keeps its game, others reload
+        white.move('e2', 'e4')
+        self.assertIs(Game.load_game('1234'), white)
+        loaded = Game.load_game('qwer')
+        self.assertIsNot(loaded, black)
+        self.assertEqual(loaded.game.current_player, BLACK)
+        loaded.move('e7', 'e5')
+        self.assertIs(Game.load_game('qwer'), loaded)
+        self.assertEqual(Game.load_game('1234').game.board.hash, loaded.game.board.hash)
+        self.assertEqual(SESSION_CACHE.stats['hits'], 3)
+        # failed move drops the game
+        white = Game.load_game('1234')
+        with patch('models.Game.add_move') as mock, self.assertRaises(errors.BaseException):
+            mock.side_effect = ValueError
+            white.move('d2', 'd4')
+        self.assertIsNot(Game.load_game('1234'), white)
+
+    @patch('game.send_ws')
+    def test_session_lost_versions(self, send_ws):
+        SESSION_CACHE.clear()
+        black = Game.load_game('qwer')
+        Game.load_game('1234').move('e2', 'e4')
+        # one game for each token
+        self.assertEqual(len(SESSION_CACHE), 2)
+        # versions are gone with redis, old games are not served again
+        cache.redis.flushdb()
+        loaded = Game.load_game('qwer')
+        self.assertIsNot(loaded, black)
+        self.assertEqual(loaded.game.current_player, BLACK)
+        self.assertIs(Game.load_game('qwer'), loaded)
+
+    def test_packed_state(self):
+        with patch('config.ENGINE_PACKED_STATE', True):
+            self.game.move('e2', 'e4', WHITE)
+            self.game.move('e7', 'e5', BLACK)
+            self.game.move('e1', 'e2', WHITE)
+        self.assertEqual(self.game.model.state, self.game.game.board.pack())
+        game = Game.load_game(self.game.model.black)
+        self.assertEqual(game.game.board.hash, self.game.game.board.hash)
+        self.assertTrue(game.game.board.getFigure(WHITE, KING).moved)
@@ -85,6 +85,12 @@ class TestHandlerGame(TestCaseWeb):
         resp = self.client.post(self.url('invite/'), data={'type': 'slow'})
         self.assertApiError(resp)
 
+    def test_computer(self):
+        # validation error
+        resp = self.client.post(self.url('computer/'), data={'type': 'fast'})
+        self.assertApiError(resp)
+        self.assertEqual(Game.select().count(), 0)
+
     def test_invite_2(self):
         # create invitation
         resp = self.client.post(self.url('invite/'), data={'type': 'no limit'})
@@ -2,7 +2,8 @@ import config
 from tests.base import TestCaseBase
 from helpers import (
     onBoard, pos2coors, coors2pos, invert_color, encrypt_password, generate_token,
-    with_context, get_queue_name, get_prefix, get_request_arg
+    with_context, get_queue_name, get_prefix, get_request_arg, computer_token,
+    is_computer, computer_level
 )
 from consts import WHITE, BLACK
 
@@ -71,6 +72,14 @@ class TestHelpers(TestCaseBase):
         self.assertEqual(get_prefix(123), '123-*')
         self.assertEqual(get_prefix(123, 30), '123-30')
 
+    def test_computer_token(self):
+        token = computer_token(3)
+        self.assertTrue(token.startswith('computer3-'))
+        self.assertTrue(is_computer(token))
+        self.assertFalse(is_computer(generate_token(True)))
+        self.assertEqual(computer_level(token), 3)
+        self.assertEqual(computer_level(computer_token()), config.BOT_DEFAULT_LEVEL)
+
     def test_get_request_arg(self):
         class _Request():
             form = {}
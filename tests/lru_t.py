@@ -0,0 +1,42 @@
+from tests.base import TestCaseBase
+from lru import LRUCache
+
+
+class TestLRUCache(TestCaseBase):
+
+    def test_get_set(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('a', 0), 0)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        # b is the least recently used
+        cache.set('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats, {
+            'size': 2, 'count': 2, 'hits': 1, 'misses': 2, 'evictions': 1, 'hit_rate': 1 / 3
+        })
+        cache.delete('a')
+        self.assertNotIn('a', cache)
+        cache.clear()
+        self.assertEqual(cache.stats, {
+            'size': 2, 'count': 0, 'hits': 0, 'misses': 0, 'evictions': 0, 'hit_rate': 0
+        })
+
+    def test_valid(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a', valid=lambda value: value == 1), 1)
+        # outdated values are dropped
+        self.assertIsNone(cache.get('a', valid=lambda value: value == 2))
+        self.assertNotIn('a', cache)
+        self.assertEqual((cache.stats['hits'], cache.stats['misses']), (1, 1))
+
+    def test_disabled(self):
+        cache = LRUCache(0)
+        cache.set('a', 1)
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('a'))
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import models
+from tests.base import TestCaseDB
+from consts import WHITE, BLACK, CASTLE_BLACK_SHORT, CASTLE_BLACK_LONG
+from game import Game
+from migrate import (
+    migrate_state, migrate_castles, migrate_clock, migrate_moves, add_column, add_unique_index
+)
+
+
+class TestMigrate(TestCaseDB):
+
+    def test_migrate_state(self):
+        models.Game.create(white='1234', black='qwer')
+        model = models.Game.create(white='asdf', black='zxcv')
+        game = Game.load_game('asdf')
+        with patch('game.send_ws'):
+            game.move('e2', 'e4', WHITE)
+            game.move('e7', 'e5', BLACK)
+            game.move('e1', 'e2', WHITE)
+        text = models.Game.get(pk=model.pk).state
+        # only games with state are migrated
+        self.assertEqual(migrate_state(), 1)
+        self.assertEqual(migrate_state(), 0)
+        state = models.Game.get(pk=model.pk).state
+        self.assertEqual(state, game.game.board.pack())
+        loaded = Game.load_game('zxcv').game.board
+        self.assertEqual(loaded.castles, CASTLE_BLACK_SHORT | CASTLE_BLACK_LONG)
+        self.assertEqual(loaded.hash, game.game.board.hash)
+        # back to text format
+        self.assertEqual(migrate_state(False), 1)
+        state = models.Game.get(pk=model.pk).state
+        self.assertEqual(sorted(state.split(',')), sorted(text.split(',')))
+
+    def test_migrate_castles(self):
+        self.assertFalse(add_column(models.Game, 'castles'))
+        models.Game.create(white='1234', black='qwer')
+        model = models.Game.create(white='asdf', black='zxcv')
+        game = Game.load_game('asdf')
+        with patch('game.send_ws'):
+            game.move('e2', 'e4', WHITE)
+            game.move('e7', 'e5', BLACK)
+            game.move('e1', 'e2', WHITE)
+        self.assertEqual(models.Game.get(pk=model.pk).castles, CASTLE_BLACK_SHORT | CASTLE_BLACK_LONG)
+        models.Game.update(castles=None).execute()
+        self.assertEqual(migrate_castles(), 1)
+        self.assertEqual(migrate_castles(), 0)
+        self.assertEqual(models.Game.get(pk=model.pk).castles, CASTLE_BLACK_SHORT | CASTLE_BLACK_LONG)
+
+    def test_migrate_clock(self):
+        game = models.Game.create(white='1234', black='qwer')
+        models.Move.create(game=game, number=1, figure='P', move='e2-e4', time_move=2, color=WHITE)
+        models.Move.create(game=game, number=2, figure='p', move='e7-e5', time_move=3, color=BLACK)
+        models.Move.create(game=game, number=3, figure='P', move='d2-d4', time_move=4, color=WHITE)
+        other = models.Game.create(white='asdf', black='zxcv', time_white=1, time_black=1)
+        models.Game.create(white='a', black='b')
+        # time stored by a move is kept
+        moved = models.Game.create(white='c', black='d', time_white=5)
+        models.Move.create(game=moved, number=1, figure='P', move='e2-e4', time_move=2, color=WHITE)
+        self.assertEqual(migrate_clock(), 3)
+        self.assertEqual(migrate_clock(), 0)
+        game = models.Game.get(pk=game.pk)
+        self.assertEqual((game.time_white, game.time_black), (6, 3))
+        self.assertEqual(models.Game.get(pk=other.pk).time_white, 1)
+        moved = models.Game.get(pk=moved.pk)
+        self.assertEqual((moved.time_white, moved.time_black), (5, 0))
+
+    def test_migrate_moves(self):
+        self.assertFalse(add_unique_index(models.Move, ('game_id', 'number')))
+        game = models.Game.create(white='1234', black='qwer')
+        models.Move.create(game=game, number=1, figure='P', move='e2-e4', time_move=2, color=WHITE)
+        models.Move.create(game=game, number=2, figure='p', move='e7-e5', time_move=3, color=BLACK)
+        models.Game.create(white='asdf', black='zxcv')
+        self.assertEqual(migrate_moves(), 2)
+        self.assertEqual(migrate_moves(), 0)
+        game = models.Game.get(pk=game.pk)
+        self.assertEqual(game.move_count, 2)
+        self.assertEqual(game.add_move('P', 'd2-d4', 'Ke1,ke8').number, 3)
@@ -1,6 +1,8 @@
 import time
 from datetime import datetime, timedelta
 
+import peewee
+
 import config
 import errors
 from tests.base import TestCaseDB
@@ -167,6 +169,46 @@ class TestModelsGame(TestCaseDB):
         self.assertEqual(game.winner, BLACK)
         self.assertFalse(game.is_time_over())
 
+    def test_move_count(self):
+        game = Game.create(white='123', black='456', state='Ke1,ke8', move_count=0)
+        self.assertEqual(game.add_move('K', 'e1-e2', 'Ke2,ke8').number, 1)
+        self.assertEqual(Game.get(pk=game.pk).move_count, 1)
+        # stale game cannot add a move with a taken number
+        stale = Game.get(pk=game.pk)
+        game.add_move('k', 'e8-e7', 'Ke2,ke7')
+        with self.assertRaises(peewee.IntegrityError):
+            stale.add_move('k', 'e8-d7', 'Ke2,kd7')
+        game = Game.get(pk=game.pk)
+        self.assertEqual((game.move_count, game.state), (2, 'Ke2,ke7'))
+        # games without counter count moves once
+        Game.update(move_count=None).execute()
+        game = Game.get(pk=game.pk)
+        self.assertEqual(game.add_move('K', 'e2-e3', 'Ke3,ke7').number, 3)
+
+    def test_time_spent(self):
+        game = Game.create(
+            white='123', black='456', state='Ke1,ke8',
+            type_game=TYPE_FAST, time_limit=20, time_white=4, time_black=0
+        )
+        # stored totals are used without moves
+        self.assertAlmostEqual(game.time_left(WHITE), 16, places=1)
+        game.date_state = datetime.now() - timedelta(seconds=3)
+        game.add_move('K', 'e1-e2', 'Ke2,ke8')
+        game = Game.get(pk=game.pk)
+        self.assertAlmostEqual(game.time_white, 7, places=1)
+        self.assertEqual(game.time_black, 0)
+        self.assertAlmostEqual(game.time_left(BLACK), 20, places=1)
+        # games without totals count moves once
+        game = Game.create(white='789', black='012', state='Ke1,ke8', type_game=TYPE_FAST, time_limit=20)
+        Move.create(game=game, number=1, figure='K', move='e1-e2', time_move=9, color=WHITE)
+        Move.create(game=game, number=2, figure='k', move='e8-e7', time_move=3, color=BLACK)
+        game.next_color = WHITE
+        game.date_state = datetime.now() - timedelta(seconds=2)
+        game.add_move('K', 'e2-e3', 'Ke3,ke7')
+        self.assertAlmostEqual(game.time_white, 11, places=1)
+        self.assertIsNone(game.time_black)
+        self.assertAlmostEqual(game.time_left(BLACK), 17, places=1)
+
     def test_time_left_2(self):
         # add game, moves and check them
         game = Game.create(
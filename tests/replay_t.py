@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+import errors
+import models
+from tests.base import TestCaseDB
+from consts import WHITE, BLACK, CASTLE_BLACK_SHORT, CASTLE_BLACK_LONG
+from game import Game
+from replay import positions, position
+
+
+class TestReplay(TestCaseDB):
+
+    def figures(self, board):
+        # packed states load figures in cell order
+        return sorted(str(board).split(','))
+
+    def play(self, moves):
+        model = models.Game.create(white='1234', black='qwer')
+        game = Game.load_game('1234')
+        boards = [self.figures(game.game.board)]
+        with patch('game.send_ws'):
+            for i, move in enumerate(moves):
+                game.move(*move.split('-'), color=WHITE if i % 2 == 0 else BLACK)
+                boards.append(self.figures(game.game.board))
+        return models.Game.get(pk=model.pk), boards
+
+    @patch('config.REPLAY_CHECKPOINT_PLIES', 3)
+    def test_positions(self):
+        moves = [
+            'e2-e4', 'e7-e5', 'g1-f3', 'b8-c6', 'f1-c4', 'g8-f6', 'e1-g1',
+            'f6-e4', 'c4-f7', 'e8-f7'
+        ]
+        model, boards = self.play(moves)
+        self.assertEqual([c.number for c in model.checkpoints.order_by(models.Checkpoint.number)], [3, 6, 9])
+        self.assertEqual(model.checkpoints.where(models.Checkpoint.number == 9).get().cut, 'Pp')
+        for number, board in enumerate(boards):
+            game = position(model, number)
+            self.assertEqual(self.figures(game.board), board)
+            self.assertEqual(game.current_player, WHITE if number % 2 == 0 else BLACK)
+        self.assertIsNone(position(model, len(moves) + 1))
+        result = [(num, self.figures(game.board)) for num, game in positions(model, 4, 8)]
+        self.assertEqual(result, list(enumerate(boards))[4:9])
+        # castle rights come from the checkpoint
+        self.assertEqual(position(model, 9).board.castles, CASTLE_BLACK_SHORT | CASTLE_BLACK_LONG)
+
+    @patch('config.REPLAY_CHECKPOINT_PLIES', 1)
+    def test_checkpoint_failed(self):
+        model = models.Game.create(white='1234', black='qwer')
+        game = Game.load_game('1234')
+        # transactions of the test database
+        with patch('config.DB', models.Game._meta.database), patch('game.send_ws'):
+            with patch('models.Checkpoint.create', side_effect=Exception):
+                with self.assertRaises(errors.BaseException):
+                    game.move('e2', 'e4')
+        # the move is rolled back with its checkpoint
+        self.assertEqual(models.Game.get(pk=model.pk).moves.count(), 0)
+        self.assertEqual(Game.load_game('1234').game.current_player, WHITE)
@@ -0,0 +1,104 @@
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import cache
+import config
+import errors
+import models
+from tests.base import TestCaseDB
+from consts import (
+    WHITE, TYPE_NOLIMIT, TYPE_SLOW, TYPE_FAST, CLOCK_QUEUE, END_TIME, WS_WIN, WS_LOSE
+)
+from game import Game
+from helpers import get_queue_name
+from scheduler import schedule_active, expire_due, run
+
+
+class TestScheduler(TestCaseDB):
+
+    def deadlines(self):
+        key = get_queue_name(CLOCK_QUEUE)
+        return {token.decode(): score for token, score in cache.redis.zrange(key, 0, -1, withscores=True)}
+
+    @patch('game.send_ws')
+    def test_expire_due(self, send_ws):
+        game = Game.new_game('1234', 'qwer', TYPE_SLOW, 60)
+        Game.new_game('asdf', 'zxcv', TYPE_NOLIMIT, None)
+        started = time.time()
+        self.assertEqual(list(self.deadlines()), ['1234'])
+        self.assertAlmostEqual(self.deadlines()['1234'], started + 60, places=0)
+        # nothing is due yet
+        self.assertEqual(expire_due(started + 30), (0, 0))
+        # move moves the deadline
+        Game.load_game('1234').move('e2', 'e4')
+        self.assertAlmostEqual(self.deadlines()['1234'], started + 60, places=0)
+        send_ws.reset_mock()
+        self.assertEqual(expire_due(started + 61), (1, 1))
+        model = models.Game.get(pk=game.model.pk)
+        self.assertEqual((model.end_reason, model.winner), (END_TIME, WHITE))
+        signals = [c[0][1] for c in send_ws.call_args_list]
+        self.assertIn(WS_WIN, signals)
+        self.assertIn(WS_LOSE, signals)
+        self.assertEqual(self.deadlines(), {})
+
+    @patch('game.send_ws')
+    def test_stale_deadline(self, send_ws):
+        Game.new_game('1234', 'qwer', TYPE_FAST, 60)
+        key = get_queue_name(CLOCK_QUEUE)
+        # deadline was read before a move
+        cache.schedule(key, '1234', time.time() - 10)
+        self.assertEqual(expire_due(time.time()), (1, 0))
+        self.assertFalse(models.Game.get(white='1234').ended)
+        self.assertGreater(self.deadlines()['1234'], time.time() + 50)
+        # resigned games are not scheduled
+        Game.load_game('qwer').resign()
+        self.assertEqual(self.deadlines(), {})
+
+    @patch('game.send_ws')
+    def test_failed_expire(self, send_ws):
+        Game.new_game('1234', 'qwer', TYPE_SLOW, 60)
+        now = time.time() + 61
+        # failed games stay scheduled
+        with patch('scheduler.Game.load_game', side_effect=errors.GameNotFoundError):
+            self.assertEqual(expire_due(now), (1, 0))
+        self.assertAlmostEqual(self.deadlines()['1234'], now + config.CLOCK_RETRY)
+        now += config.CLOCK_RETRY
+        with patch('game.Game.check_time', side_effect=ValueError):
+            self.assertEqual(expire_due(now), (1, 0))
+        self.assertAlmostEqual(self.deadlines()['1234'], now + config.CLOCK_RETRY)
+        self.assertEqual(expire_due(now + config.CLOCK_RETRY), (1, 1))
+        self.assertEqual(self.deadlines(), {})
+        # deleted games are dropped
+        cache.schedule(get_queue_name(CLOCK_QUEUE), 'asdf', now)
+        self.assertEqual(expire_due(now), (1, 0))
+        self.assertEqual(self.deadlines(), {})
+
+    @patch('game.send_ws')
+    def test_no_limit(self, send_ws):
+        # timed type without limit never runs out of time
+        game = Game.new_game('1234', 'qwer', TYPE_FAST, None)
+        self.assertIsNone(game.time_left(WHITE))
+        self.assertEqual(self.deadlines(), {})
+        self.assertEqual(schedule_active(), 1)
+        # broken rows do not stop the worker
+        models.Game.create(white='asdf', black='zxcv', type_game=TYPE_SLOW, time_limit=60)
+        with patch('models.Game.deadline', side_effect=[TypeError, None]):
+            self.assertEqual(schedule_active(), 1)
+
+    @patch('game.send_ws')
+    def test_run(self, send_ws):
+        models.Game.create(
+            white='1234', black='qwer', type_game=TYPE_SLOW, time_limit=60,
+            date_state=datetime.now() - timedelta(seconds=30)
+        )
+        models.Game.create(white='asdf', black='zxcv', type_game=TYPE_SLOW, time_limit=60)
+        models.Game.create(white='a', black='b')
+        self.assertEqual(schedule_active(), 2)
+        clock = iter([time.time() + 40, time.time() + 100])
+        # the clock stops the worker when it runs out
+        with self.assertRaises(StopIteration):
+            run(clock=lambda: next(clock), sleep=lambda seconds: None)
+        self.assertTrue(models.Game.get(white='1234').ended)
+        self.assertTrue(models.Game.get(white='asdf').ended)
+        self.assertEqual(self.deadlines(), {})
@@ -1,7 +1,8 @@
 from tests.base import TestCaseDB, MockRequest
 from validators import (
     BaseValidator, RegistrationValidator, LoginValidator, GameNewValidator,
-    GameMoveValidator, ResetValidator, RecoverValidator, MessageValidator
+    GameComputerValidator, GameMoveValidator, ResetValidator, RecoverValidator,
+    MessageValidator
 )
 from models import User
 import errors
@@ -97,6 +98,17 @@ class TestValidators(TestCaseDB):
         ]
         self.assertValidations(GameNewValidator, ('type', 'limit'), cases)
 
+    def test_computer_game(self):
+        cases = [
+            (('fast', '5m', '9'), False, 'level', None),
+            (('urgent', None, '1'), False, 'type', None),
+            (('fast', '5m', '2'), True, None, {'type': TYPE_FAST, 'limit': 300, 'level': 2}),
+            ((None, None, None), True, None, {
+                'type': TYPE_NOLIMIT, 'limit': None, 'level': config.BOT_DEFAULT_LEVEL
+            }),
+        ]
+        self.assertValidations(GameComputerValidator, ('type', 'limit', 'level'), cases)
+
     def test_move(self):
         cases = [
             (('e0-e4',), False, 'coordinate', None),